@@ -0,0 +1,62 @@
+import hashlib
+import os
+
+import pandas as pd
+
+# Bump when the layout of cached files changes so old ones are ignored
+CACHE_VERSION = 1
+
+# Rows and columns of the 96-well plate block on every sheet of the plate
+# reader export (rows A-F, columns 1-12)
+PLATE_ROWS = slice(26, 32)
+PLATE_COLUMNS = slice(2, 14)
+
+
+# SHA-1 of a file's bytes, read in blocks
+def file_digest(path, block_size=1024 ** 2):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# The plate block of one sheet, with well rows A, B, ... as the index and
+# well columns '1', '2', ... as the columns
+def plate_block(sheet, rows=PLATE_ROWS, columns=PLATE_COLUMNS):
+    data = sheet.iloc[rows, columns].reset_index(drop=True)
+    data.index = [chr(65 + i) for i in range(len(data.index))]
+    data.columns = [str(i) for i in range(1, len(data.columns) + 1)]
+    return data
+
+
+# Plate blocks of every sheet of an ODS workbook as {sheet name: block}, in
+# sheet order. The workbook is parsed once for all sheets, and the blocks are
+# cached in cache_dir as one Parquet file named by a hash of the workbook's
+# contents and the block position, so rerunning on an unchanged workbook
+# reads the small Parquet file and skips ODS parsing. Values are stored as
+# numbers; text cells become NaN, as pd.to_numeric(errors='coerce') would
+# make them in the analysis. cache_dir=None disables the cache.
+def load_plates(filename, rows=PLATE_ROWS, columns=PLATE_COLUMNS, cache_dir='.plate_cache'):
+    path = None
+    if cache_dir is not None:
+        key = hashlib.sha1(f'v{CACHE_VERSION}|{file_digest(filename)}|{rows}|{columns}'.encode()).hexdigest()
+        path = os.path.join(cache_dir, key + '.parquet')
+        if os.path.exists(path):
+            table = pd.read_parquet(path)
+            return {sheet: block.drop(columns='sheet').set_index('row').rename_axis(None)
+                    for sheet, block in table.groupby('sheet', sort=False)}
+
+    sheets = pd.read_excel(filename, engine='odf', sheet_name=None, header=None)
+    plates = {str(name): plate_block(sheet, rows, columns).apply(pd.to_numeric, errors='coerce')
+              for name, sheet in sheets.items()}
+
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        table = pd.concat([block.rename_axis('row').reset_index().assign(sheet=sheet)
+                           for sheet, block in plates.items()], ignore_index=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        table.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    return plates
+
@@ -3,16 +3,10 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.gridspec import GridSpec
+from plate_loader import load_plates
 
 print("Current working directory:", os.getcwd())
 
-def extract_data(filename, sheet_name):
-    df = pd.read_excel(filename, engine='odf', sheet_name=sheet_name, header=None)
-    data = df.iloc[26:32, 2:14].reset_index(drop=True)
-    data.index = [chr(65 + i) for i in range(6)]  # A to F
-    data.columns = [str(i) for i in range(1, 13)]
-    return data
-
 def calculate_biofilm_inhibition(df, control_column, discard_cells=None):
     processed_df = df.loc['A':'F', :].apply(pd.to_numeric, errors='coerce')
     
@@ -40,9 +34,11 @@ def remove_outliers(df):
 filename = os.path.join(os.getcwd(), 'PhD_data', 'paper_3', 'Anti-biofilm_.ods')
 print("Attempting to open file:", filename)
 
-# Extract data from both sheets
-ecoli_data = extract_data(filename, 0)
-other_data = extract_data(filename, 1)
+# Extract the plate data of both sheets (the workbook is parsed once and
+# the plates cached, see plate_loader)
+plates = list(load_plates(filename).values())
+ecoli_data = plates[0]
+other_data = plates[1]
 
 # Print raw extracted data
 print("\nRaw extracted data for E. coli:")
@@ -0,0 +1,106 @@
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+import porespy as ps
+from scipy import ndimage
+
+from sem_thickness import fast_local_thickness
+from sem_tiling import tiled_porosimetry
+
+
+# Binary image (or volume, with ndim=3) with a mean-threshold porosity of
+# about one half and pores a few times `smoothing` pixels across, like a
+# thresholded SEM image
+def synthetic_binary(size, smoothing=4, seed=0, ndim=2):
+    rng = np.random.default_rng(seed)
+    field = ndimage.gaussian_filter(rng.random((size,) * ndim), smoothing)
+    return field > field.mean()
+
+
+def measure(fn, *args, **kwargs):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    result = fn(*args, **kwargs)
+    return result, {'wall_s': time.perf_counter() - wall, 'cpu_s': time.process_time() - cpu}
+
+
+# Fraction of pore pixels given the same size, and the largest difference
+# between the cumulative pore size distributions on the exact mode's bins
+def compare(exact, fast, im):
+    psd_exact = ps.metrics.pore_size_distribution(exact)
+    psd_fast = ps.metrics.pore_size_distribution(fast, bins=psd_exact.bin_edges)
+    return {'pixel_agreement': float(np.mean(exact[im] == fast[im])),
+            'max_cdf_difference': float(np.abs(psd_fast.cdf - psd_exact.cdf).max())}
+
+
+# Exact porosimetry against the fast modes on one synthetic image
+def bench_case(size, smoothing, sizes=25, seed=0):
+    im = synthetic_binary(size, smoothing, seed)
+    case = {'size': size, 'smoothing': smoothing, 'porosity': float(im.mean())}
+    exact, stats = measure(ps.filters.porosimetry, im)
+    records = [{**case, 'mode': 'exact', **stats}]
+    modes = {'fast': {}, f'fast_{sizes}_sizes': {'sizes': sizes},
+             'fast_local_thickness': {'access_limited': False}}
+    for mode, kwargs in modes.items():
+        fast, stats = measure(fast_local_thickness, im, **kwargs)
+        stats['speedup'] = records[0]['wall_s'] / stats['wall_s']
+        records.append({**case, 'mode': mode, **stats, **compare(exact, fast, im)})
+    return records
+
+
+# Tiled porosimetry against the whole-image filter, on an image or volume
+# with tiles that touch no face of it (size >= 3 tiles), so pores there are
+# only reached through other tiles. interior_nonzero is the fraction of the
+# central tile given a pore size by each.
+def bench_tiled(size, smoothing, tile, overlap, ndim=2, seed=0):
+    im = synthetic_binary(size, smoothing, seed, ndim)
+    exact, exact_stats = measure(ps.filters.porosimetry, im)
+    tiled, stats = measure(tiled_porosimetry, im, tile, overlap)
+    centre = (slice(tile, 2 * tile),) * ndim
+    psd_exact = ps.metrics.pore_size_distribution(exact)
+    psd_tiled = ps.metrics.pore_size_distribution(tiled)
+    return {'size': size, 'ndim': ndim, 'smoothing': smoothing, 'tile': tile, 'overlap': overlap,
+            'mode': 'tiled', 'exact_wall_s': exact_stats['wall_s'], **stats,
+            'pixel_agreement': float(np.mean(exact[im] == tiled[im])),
+            'max_cdf_difference': float(np.abs(psd_tiled.cdf - psd_exact.cdf).max()),
+            'interior_nonzero': float(np.mean(tiled[centre] > 0)),
+            'interior_nonzero_exact': float(np.mean(exact[centre] > 0))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exact vs fast pore-size maps: speed and difference.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[512, 1024, 2048], help='Image sizes in pixels')
+    parser.add_argument('--smoothing', type=float, nargs='+', default=[2, 4, 8],
+                        help='Gaussian smoothing of the synthetic images (sets the pore size)')
+    parser.add_argument('--log-sizes', type=int, default=25, help='Radii for the log-spaced fast mode')
+    parser.add_argument('--no-tiled', action='store_true',
+                        help='Skip the tiled-vs-whole checks (2-D and 3-D, with interior tiles)')
+    parser.add_argument('--output', default=None, help='Write JSON results here instead of stdout')
+    args = parser.parse_args()
+
+    records = []
+    for size in args.sizes:
+        for smoothing in args.smoothing:
+            records.extend(bench_case(size, smoothing, args.log_sizes))
+            print(f"done: size={size} smoothing={smoothing}", file=sys.stderr)
+    if not args.no_tiled:
+        records.append(bench_tiled(700, 4, tile=128, overlap=80))
+        records.append(bench_tiled(96, 2, tile=24, overlap=12, ndim=3))
+        print('done: tiled', file=sys.stderr)
+
+    report = {'python': platform.python_version(), 'numpy': np.__version__, 'porespy': ps.__version__,
+              'machine': platform.machine(), 'results': records}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,26 @@
 import porespy as ps
 import numpy as np
 import matplotlib.pyplot as plt
-from skimage import io
+import argparse
+import multiprocessing
 import os
+import time
+from functools import partial
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from sem_cache import SegmentationCache, file_digest
+from sem_io import is_stack, load_image, load_stack, slab_rows, threshold_mean, to_gray
+from sem_pores import crop_padding, pore_metrics, write_pore_table
+from sem_preview import imshow_preview
+from sem_profiling import DISABLED, StageProfiler
+from sem_thickness import fast_local_thickness
+from sem_tiling import streamed_pore_size_distribution, tiled_porosimetry, tiled_snow
+from sem_watch import FolderWatcher, append_results, plot_results_psd, read_results, result_rows
 
 # Define the scale: pixels per micrometer
 pixels_per_micrometer = 100  # Example value, adjust based on your image scale
 
-def process_image(image_path):
-    im = io.imread(image_path)
-    if im.ndim == 3:
-        im = im.mean(axis=2)
-    im_binary = im > im.mean()
-    snow = ps.networks.snow2(im_binary, voxel_size=1/pixels_per_micrometer)
-    mip = ps.filters.porosimetry(im_binary)
-    psd = ps.metrics.pore_size_distribution(mip)
-    return im, snow, psd
+# Folder with the SEM images
+image_dir = '/home/m/Data_analytics/PhD_data/paper_3/image_processing'
 
 # List of image files
 image_files = [
@@ -24,79 +29,471 @@ image_files = [
     'BNCPHB5_surface_10kv_5kx_1.tif',
     'BNCPHB10_surface_10kv_5kx_1.tif'
 ]
+labels = ['BNC', 'BPHB2', 'BPHB5', 'BPHB10']
+
+image_extensions = ('.tif', '.tiff', '.png', '.jpg', '.jpeg', '.bmp')
+
+# Pore-size map filters: 'exact' is porespy's porosimetry, 'fast' gives the
+# same map from one distance transform (see sem_thickness)
+pore_size_filters = {'exact': ps.filters.porosimetry, 'fast': fast_local_thickness}
+
+
+# Uncompressed TIFFs are memory-mapped and RGB images reduced to float32
+# grayscale (uint8 grayscale is kept as is), so no full-size float64 copy of
+# the image is made before segmentation. With a SegmentationCache, images
+# analysed before are read back from disk; snow then holds only `regions`.
+# Each step is timed as a stage of `profiler` (see sem_profiling).
+# pore_size_mode picks the pore-size filter from pore_size_filters.
+def process_image(image_path, cache=None, profiler=DISABLED, pore_size_mode='exact'):
+    image = os.path.basename(image_path)
+    with profiler.stage('load', image=image):
+        im = to_gray(load_image(image_path))
+    if cache is not None:
+        with profiler.stage('cache_lookup', image=image):
+            key = cache.key(file_digest(image_path), pixels_per_micrometer, 'snow2', 'porosimetry', pore_size_mode)
+            cached = cache.get(key)
+        if cached is not None:
+            snow, _, psd = cached
+            return im, snow, psd
+
+    with profiler.stage('threshold', image=image):
+        im_binary = threshold_mean(im)
+    with profiler.stage('snow2', image=image):
+        snow = ps.networks.snow2(im_binary, voxel_size=1/pixels_per_micrometer)
+    with profiler.stage('porosimetry', image=image, mode=pore_size_mode):
+        mip = pore_size_filters[pore_size_mode](im_binary)
+    with profiler.stage('psd', image=image):
+        psd = ps.metrics.pore_size_distribution(mip)
+    if cache is not None:
+        with profiler.stage('cache_store', image=image):
+            cache.put(key, snow, mip, psd)
+    return im, snow, psd
+
+
+# Memory-bounded process_image for stitched mosaics too large to filter in
+# one piece. SNOW runs on overlapping tiles of tile x tile pixels, and the
+# pore-size map is built as in tiled_porosimetry: access from the image faces
+# is worked out over the whole image, so it equals ps.filters.porosimetry
+# (both pore-size modes give this map) when the overlap is at least the
+# largest pore radius. The overlap is overlap_radii times the largest
+# expected pore radius (in micrometers); the margin beyond one radius is for
+# SNOW, whose labels are merged through the overlap. snow holds only the
+# stitched regions, not a pore network.
+def process_image_tiled(image_path, tile=2048, max_pore_radius=1.0, overlap_radii=6, cache=None,
+                        profiler=DISABLED):
+    image = os.path.basename(image_path)
+    with profiler.stage('load', image=image):
+        im = to_gray(load_image(image_path))
+    overlap = int(np.ceil(overlap_radii * max_pore_radius * pixels_per_micrometer))
+    if cache is not None:
+        with profiler.stage('cache_lookup', image=image):
+            key = cache.key(file_digest(image_path), pixels_per_micrometer, 'tiled', tile, overlap)
+            cached = cache.get(key)
+        if cached is not None:
+            snow, _, psd = cached
+            return im, snow, psd
+
+    with profiler.stage('threshold', image=image):
+        im_binary = threshold_mean(im)
+    with profiler.stage('snow_tiled', image=image, tile=tile):
+        snow = tiled_snow(im_binary, tile=tile, overlap=overlap)
+    with profiler.stage('porosimetry_tiled', image=image, tile=tile):
+        mip = tiled_porosimetry(im_binary, tile=tile, overlap=overlap)
+    with profiler.stage('psd', image=image):
+        psd = streamed_pore_size_distribution(mip)
+    if cache is not None:
+        with profiler.stage('cache_store', image=image):
+            cache.put(key, snow, mip, psd)
+    return im, snow, psd
+
+
+# 3-D pore analysis of a FIB-SEM or micro-CT volume (a multi-page TIFF or a
+# directory of slices, see load_stack) too large for memory. The volume is
+# read lazily, the thresholded volume, SNOW regions and pore-size map (and
+# the distance and access-radius maps behind it) are written as .npy files
+# in out_dir (memory-mapped, so they can be reopened with
+# np.load(..., mmap_mode='r')), and SNOW and porosimetry run on overlapping
+# chunk^3 tiles as in process_image_tiled, with pore access from the faces
+# of the whole volume. Porosimetry overlaps its chunks by one max_pore_radius
+# and SNOW, whose labels only need merging across chunk edges, by
+# snow_overlap voxels; a chunk plus its overlap is what is held in memory at
+# once, so an overlap larger than the chunk is refused. voxel_size and
+# max_pore_radius are in micrometers; the PSD is in voxels like the 2-D one.
+# Returns (regions, pore_size, psd).
+def process_volume(volume_path, out_dir, chunk=256, voxel_size=1/pixels_per_micrometer, max_pore_radius=1.0,
+                   snow_overlap=16, profiler=DISABLED):
+    image = os.path.basename(os.path.normpath(volume_path))
+    overlap = int(np.ceil(max_pore_radius / voxel_size))
+    if max(overlap, snow_overlap) > chunk:
+        raise ValueError(f'overlap of {max(overlap, snow_overlap)} voxels is larger than the {chunk}-voxel chunks; '
+                         f'use a larger chunk or a smaller max_pore_radius or snow_overlap')
+    os.makedirs(out_dir, exist_ok=True)
+
+    def output(name, dtype):
+        return np.lib.format.open_memmap(os.path.join(out_dir, name), mode='w+', dtype=dtype, shape=volume.shape)
+
+    with profiler.stage('load', image=image):
+        volume = load_stack(volume_path)
+    slab = slab_rows(volume.shape)
+
+    with profiler.stage('threshold', image=image):
+        im_binary = threshold_mean(volume, rows=slab, out=output('binary.npy', bool))
+    with profiler.stage('snow_tiled', image=image, tile=chunk):
+        regions = tiled_snow(im_binary, tile=chunk, overlap=snow_overlap, out=output('regions.npy', np.int32)).regions
+    with profiler.stage('porosimetry_tiled', image=image, tile=chunk):
+        work = output('radius.npy', np.uint16), output('access_radius.npy', np.uint16)
+        pore_size = tiled_porosimetry(im_binary, tile=chunk, overlap=overlap, out=output('pore_size.npy', np.float32),
+                                      work=work)
+    with profiler.stage('psd', image=image):
+        psd = streamed_pore_size_distribution(pore_size, slab=slab)
+    for array in (im_binary, regions, pore_size) + work:
+        array.flush()
+    return regions, pore_size, psd
 
-# Process all images
-results = []
-for image_file in image_files:
-    image_path = os.path.join('/home/m/Data_analytics/PhD_data/paper_3/image_processing', image_file)
-    results.append(process_image(image_path))
-
-# Create a single figure with all plots
-cm = 1/2.54  # centimeters in inches
-fig = plt.figure(figsize=(4.6*cm, 8*cm))
-gs = fig.add_gridspec(4, 4, height_ratios=[1, 1, 0.5, 1])
-
-# Plot SEM Images
-for i, (im, _, _) in enumerate(results):
-    ax_sem = fig.add_subplot(gs[i//2, i%2*2:i%2*2+2])
-    
-    # Calculate margins to center the image
-    height, width = im.shape
-    aspect_ratio = width / height
-    subplot_ratio = ax_sem.get_position().width / ax_sem.get_position().height
-    
-    if aspect_ratio > subplot_ratio:
-        # Image is wider than subplot
-        new_height = width / subplot_ratio
-        margin = (new_height - height) / 2
-        extent = [-margin, width+margin, height, 0]
+
+# Per-pore table for one processed image: the SNOW regions (without snow2's
+# boundary padding) with the local thickness of the thresholded image, in
+# micrometers. The thickness map is built from one distance transform (see
+# sem_thickness) with 25 log-spaced radii, like porespy's local_thickness.
+def pore_table(im, snow, profiler=DISABLED, image=None):
+    im_binary = threshold_mean(im)
+    with profiler.stage('local_thickness', image=image):
+        thickness = fast_local_thickness(im_binary, sizes=25, access_limited=False)
+    with profiler.stage('pore_metrics', image=image):
+        regions = crop_padding(snow.regions, im_binary.shape)
+        return pore_metrics(regions, thickness, voxel_size=1/pixels_per_micrometer)
+
+
+# Worker task: process one image and, with pore_dir, write its pore table
+# there as <image name>_pores.parquet. Returns the result and the stage
+# records of a profiler created here (profile is (enabled, track_memory)), so
+# records made in worker processes reach the caller.
+def _process_and_tabulate(image_path, process, pore_dir=None, profile=(False, False)):
+    profiler = StageProfiler(*profile) if profile[0] else DISABLED
+    with profiler.stage('total', image=os.path.basename(image_path)):
+        result = process(image_path, profiler=profiler)
+        if pore_dir is not None:
+            name = os.path.splitext(os.path.basename(image_path))[0]
+            table = pore_table(result[0], result[1], profiler, os.path.basename(image_path))
+            write_pore_table(table, os.path.join(pore_dir, f'{name}_pores.parquet'))
+    return result, profiler.records
+
+
+# Run process_image over many images and yield (path, result) pairs as soon
+# as each image finishes. With more than one worker the images are spread
+# over a process pool, so a batch scales with the number of cores. Workers
+# are started by a fork server: children forked from a process that has
+# already run porespy (numba threads and locks included) can hang.
+# With pore_dir a per-pore table is written for every image, and an enabled
+# StageProfiler collects the stage timings of every image, including those
+# run in workers. Extra keyword arguments select and configure tiled mode
+# (see process_image_tiled), e.g. process_images(paths, tile=4096);
+# pore_size_mode only applies to untiled runs.
+def process_images(image_paths, n_workers=None, cache=None, pore_dir=None, profiler=DISABLED,
+                   pore_size_mode='exact', **tiled_kwargs):
+    if tiled_kwargs:
+        process = partial(process_image_tiled, cache=cache, **tiled_kwargs)
     else:
-        # Image is taller than subplot
-        new_width = height * subplot_ratio
-        margin = (new_width - width) / 2
-        extent = [0, width, height, 0]
-    
-    ax_sem.imshow(im, cmap='gray', extent=extent)
-    ax_sem.set_title(chr(65 + i), fontsize=10, loc='left', pad=1)
-    ax_sem.axis('off')
-    
-    # Add scale bar
-    scalebar_length = 10 * pixels_per_micrometer  # 10 micrometers
-    ax_sem.plot([10, 10 + scalebar_length], [im.shape[0] - 10, im.shape[0] - 10], color='white', lw=0.5)
-    ax_sem.text(10, im.shape[0] - 20, '10 μm', color='white', fontsize=8)
-
-# Plot SNOW2 Segmentations
-for i, (_, snow, _) in enumerate(results):
-    ax_snow = fig.add_subplot(gs[2, i])
-    ax_snow.imshow(snow.regions, cmap='nipy_spectral')
-    ax_snow.set_title(chr(69 + i), fontsize=10, loc='left', pad=1)
-    ax_snow.axis('off')
-
-# Plot Pore Size Distributions
-ax_psd = fig.add_subplot(gs[3, :])
-colors = ['b', 'g', 'r', 'c']
-labels = ['BNC', 'BPHB2', 'BPHB5', 'BPHB10']
-for (_, _, psd), color, label in zip(results, colors, labels):
-    ax_psd.plot(psd.bin_centers * (1/pixels_per_micrometer), psd.cdf, color=color, label=label)
-ax_psd.set_xscale('log')
-ax_psd.set_xlabel('Pore Radius (μm)', fontsize=10)
-ax_psd.set_ylabel('Cumulative Distribution', fontsize=10)
-ax_psd.legend(fontsize=8)
-ax_psd.set_title('I', fontsize=8, loc='left', pad=1)
-ax_psd.tick_params(axis='both', which='major', labelsize=8)
-
-plt.tight_layout()
-plt.subplots_adjust(hspace=0.2, wspace=0.1)
-
-# Calculate the size in pixels for 600 DPI
-width_pixels = int(4.6 * 600 / 2.54)
-height_pixels = int(8 * 600 / 2.54)
-
-# Save the figure with at least 600 DPI
-plt.savefig('sem_analysis_composite.png', dpi=600, bbox_inches='tight', 
-            pad_inches=0.1, format='png')
-plt.savefig('sem_analysis_composite.tif', dpi=600, bbox_inches='tight', 
-            pad_inches=0.1, format='tiff', pil_kwargs={'compression': 'tiff_lzw'})
-
-# Optionally, also show the plot
-plt.show()
+        process = partial(process_image, cache=cache, pore_size_mode=pore_size_mode)
+    process = partial(_process_and_tabulate, process=process, pore_dir=pore_dir,
+                      profile=(profiler.enabled, profiler.track_memory))
+    if n_workers == 1:
+        for image_path in image_paths:
+            result, records = process(image_path)
+            profiler.extend(records)
+            yield image_path, result
+        return
+
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('forkserver')) as pool:
+        futures = {pool.submit(process, image_path): image_path for image_path in image_paths}
+        for future in as_completed(futures):
+            result, records = future.result()
+            profiler.extend(records)
+            yield futures[future], result
+
+
+# Watch-mode worker task: process one image as _process_and_tabulate does
+# and return only its results-table rows, not the label image
+def _process_and_summarise(image_path, state, process, pore_dir=None):
+    (_, snow, psd), _ = _process_and_tabulate(image_path, process, pore_dir)
+    return result_rows(os.path.basename(image_path), state, int(snow.regions.max()), psd)
+
+
+# Watch a folder the microscope writes into: every `interval` seconds, images
+# that are new or modified since they were processed (see FolderWatcher) are
+# queued on a background process pool (started by a fork server, as in
+# process_images). Each finished image's rows are appended to the CSV
+# results table, and the PSD figure of all images in it is redrawn and
+# saved to figure_path. Images already in the table are never
+# processed again, also across restarts. Runs until interrupted, or for
+# max_polls scans plus the time to finish the images they queued.
+def watch(directory, results_path='sem_results.csv', figure_path='sem_results_psd.png', interval=10,
+          n_workers=None, cache=None, pore_dir=None, pore_size_mode='exact', max_polls=None, **tiled_kwargs):
+    if tiled_kwargs:
+        process = partial(process_image_tiled, cache=cache, **tiled_kwargs)
+    else:
+        process = partial(process_image, cache=cache, pore_size_mode=pore_size_mode)
+    watcher = FolderWatcher.from_results(directory, read_results(results_path), extensions=image_extensions)
+    futures = {}
+    polls = 0
+
+    # Append a finished image's rows to the results table and report it
+    def collect(future):
+        name = futures.pop(future)
+        watcher.mark_processed(name)
+        try:
+            append_results(results_path, future.result())
+        except Exception as error:
+            print(f"{name}: failed ({error})")
+            return
+        print(f"{name}: done, {len(futures)} queued")
+
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('forkserver')) as pool:
+        try:
+            while True:
+                if max_polls is None or polls < max_polls:
+                    for image_path, state in watcher.poll():
+                        future = pool.submit(_process_and_summarise, image_path, state, process, pore_dir)
+                        futures[future] = os.path.basename(image_path)
+                    polls += 1
+                elif not futures:
+                    break
+
+                if not futures:
+                    time.sleep(interval)
+                    continue
+                done, _ = wait(futures, timeout=interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+                if done:
+                    refresh_results_figure(results_path, figure_path)
+        except KeyboardInterrupt:
+            # Keep the images that finished since the last poll, then stop
+            # the workers instead of waiting for the running images (the
+            # pool would otherwise wait for them on exit, also at interpreter
+            # shutdown)
+            print('Stopping; unfinished images are processed on the next start')
+            finished = [future for future in futures
+                        if future.done() and not future.cancelled() and future.exception() is None]
+            for future in finished:
+                collect(future)
+            if finished:
+                refresh_results_figure(results_path, figure_path)
+            workers = list((pool._processes or {}).values())
+            pool.shutdown(wait=False, cancel_futures=True)
+            for worker in workers:
+                worker.terminate()
+
+
+# Redraw the PSD figure of every image in the results table
+def refresh_results_figure(results_path, figure_path):
+    fig, ax = plt.subplots(figsize=(8/2.54, 6/2.54))
+    plot_results_psd(read_results(results_path), pixels_per_micrometer, ax)
+    fig.tight_layout()
+    fig.savefig(figure_path, dpi=600, bbox_inches='tight')
+    plt.close(fig)
+
+
+# All SEM images in a folder, sorted by name. 3-D TIFF stacks are left out
+# with a note, since they are analysed with --volume.
+def list_images(directory):
+    image_paths = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(image_extensions):
+            continue
+        if is_stack(os.path.join(directory, name)):
+            print(f"{name}: skipped, a 3-D stack (analyse it with --volume)")
+            continue
+        image_paths.append(os.path.join(directory, name))
+    return image_paths
+
+
+# Image panels are drawn from the pyramid level matching their size at the
+# `dpi` the figure will be saved at, not from the full-resolution arrays
+def plot_composite(results, labels, dpi=600):
+    # Create a single figure with all plots
+    cm = 1/2.54  # centimeters in inches
+    fig = plt.figure(figsize=(4.6*cm, 8*cm))
+    gs = fig.add_gridspec(4, 4, height_ratios=[1, 1, 0.5, 1])
+
+    # Plot SEM Images
+    for i, (im, _, _) in enumerate(results):
+        ax_sem = fig.add_subplot(gs[i//2, i%2*2:i%2*2+2])
+
+        # Calculate margins to center the image
+        height, width = im.shape
+        aspect_ratio = width / height
+        subplot_ratio = ax_sem.get_position().width / ax_sem.get_position().height
+
+        if aspect_ratio > subplot_ratio:
+            # Image is wider than subplot
+            new_height = width / subplot_ratio
+            margin = (new_height - height) / 2
+            extent = [-margin, width+margin, height, 0]
+        else:
+            # Image is taller than subplot
+            new_width = height * subplot_ratio
+            margin = (new_width - width) / 2
+            extent = [0, width, height, 0]
+
+        imshow_preview(ax_sem, im, dpi, extent=extent, cmap='gray')
+        ax_sem.set_title(chr(65 + i), fontsize=10, loc='left', pad=1)
+        ax_sem.axis('off')
+
+        # Add scale bar
+        scalebar_length = 10 * pixels_per_micrometer  # 10 micrometers
+        ax_sem.plot([10, 10 + scalebar_length], [im.shape[0] - 10, im.shape[0] - 10], color='white', lw=0.5)
+        ax_sem.text(10, im.shape[0] - 20, '10 μm', color='white', fontsize=8)
+
+    # Plot SNOW2 Segmentations
+    for i, (_, snow, _) in enumerate(results):
+        ax_snow = fig.add_subplot(gs[2, i])
+        imshow_preview(ax_snow, snow.regions, dpi, labels=True, cmap='nipy_spectral')
+        ax_snow.set_title(chr(69 + i), fontsize=10, loc='left', pad=1)
+        ax_snow.axis('off')
+
+    # Plot Pore Size Distributions
+    ax_psd = fig.add_subplot(gs[3, :])
+    colors = ['b', 'g', 'r', 'c']
+    for (_, _, psd), color, label in zip(results, colors, labels):
+        ax_psd.plot(psd.bin_centers * (1/pixels_per_micrometer), psd.cdf, color=color, label=label)
+    ax_psd.set_xscale('log')
+    ax_psd.set_xlabel('Pore Radius (μm)', fontsize=10)
+    ax_psd.set_ylabel('Cumulative Distribution', fontsize=10)
+    ax_psd.legend(fontsize=8)
+    ax_psd.set_title('I', fontsize=8, loc='left', pad=1)
+    ax_psd.tick_params(axis='both', which='major', labelsize=8)
+
+    plt.tight_layout()
+    plt.subplots_adjust(hspace=0.2, wspace=0.1)
+    return fig
+
+
+# Cumulative pore size distribution of a volume against pore radius in
+# micrometers, saved with the volume results
+def plot_volume_psd(radius, psd, label):
+    fig, ax = plt.subplots(figsize=(8/2.54, 6/2.54))
+    ax.plot(radius, psd.cdf, color='b', label=label)
+    ax.set_xscale('log')
+    ax.set_xlabel('Pore Radius (μm)', fontsize=10)
+    ax.set_ylabel('Cumulative Distribution', fontsize=10)
+    ax.legend(fontsize=8)
+    ax.tick_params(axis='both', which='major', labelsize=8)
+    fig.tight_layout()
+    return fig
+
+
+# --volume: process_volume with the command-line options, then the PSD as a
+# table and a figure next to the volume results
+def analyse_volume(args):
+    name = os.path.basename(os.path.normpath(args.volume))
+    out_dir = args.volume_out or f'{os.path.splitext(name)[0]}_pores'
+    profiler = StageProfiler(track_memory=args.profile_memory) if args.profile else DISABLED
+    regions, _, psd = process_volume(args.volume, out_dir, args.chunk, args.voxel_size, args.max_pore_radius,
+                                     args.snow_overlap, profiler=profiler)
+    print(f"{name}: {regions.shape} voxels, {regions.max()} regions, results in {out_dir}")
+
+    # Bin centres are log10 radii in voxels
+    radius = (10 ** psd.bin_centers if hasattr(psd, 'LogR') else psd.bin_centers) * args.voxel_size
+    np.savetxt(os.path.join(out_dir, 'psd.csv'), np.column_stack([radius, psd.pdf, psd.cdf]), delimiter=',',
+               header='radius_um,pdf,cdf', comments='')
+    plot_volume_psd(radius, psd, name).savefig(os.path.join(out_dir, 'psd.png'), dpi=600, bbox_inches='tight')
+    if args.profile:
+        profiler.write(args.profile)
+        print(profiler.summary().to_string(index=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pore analysis (SNOW2, porosimetry, PSD) of SEM images.')
+    parser.add_argument('--image-dir', default=image_dir, help='Folder with the SEM images')
+    parser.add_argument('--all', action='store_true',
+                        help='Process every image in --image-dir instead of the four figure images')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes (default: all cores, 1 to run in-process)')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep watching --image-dir and process new or modified images as they appear')
+    parser.add_argument('--watch-interval', type=float, default=10, help='Seconds between folder scans')
+    parser.add_argument('--results-table', default='sem_results.csv',
+                        help='Watch mode: CSV table that results are appended to (default: sem_results.csv)')
+    parser.add_argument('--volume', default=None,
+                        help='Analyse this 3-D stack (multi-page TIFF or folder of slices) instead of 2-D images')
+    parser.add_argument('--volume-out', default=None,
+                        help='Folder for the volume results (default: <volume name>_pores)')
+    parser.add_argument('--chunk', type=int, default=256, help='Edge length in voxels of the 3-D processing chunks')
+    parser.add_argument('--voxel-size', type=float, default=1/pixels_per_micrometer,
+                        help='Voxel edge length of the volume in micrometers')
+    parser.add_argument('--snow-overlap', type=int, default=16,
+                        help='Overlap in voxels of the 3-D chunks for SNOW (porosimetry overlaps by --max-pore-radius)')
+    parser.add_argument('--tile', type=int, default=None,
+                        help='Process each image in overlapping tiles of this many pixels (for large mosaics)')
+    parser.add_argument('--max-pore-radius', type=float, default=1.0,
+                        help='Largest expected pore radius in micrometers; sets the tile and chunk overlap')
+    parser.add_argument('--pore-size-mode', choices=sorted(pore_size_filters), default='exact',
+                        help="Pore-size map: porespy's porosimetry (exact) or one distance transform (fast); "
+                             "tiled and volume runs always build the porosimetry map tile by tile")
+    parser.add_argument('--cache-dir', default='.sem_cache',
+                        help='Reuse segmentations from earlier runs stored here (default: .sem_cache)')
+    parser.add_argument('--no-cache', action='store_true', help='Always recompute the segmentation')
+    parser.add_argument('--pore-tables', default=None,
+                        help='Write a per-pore metrics table (Parquet) for each image into this folder')
+    parser.add_argument('--profile', default=None,
+                        help='Record time and memory per stage and image to this .json or .csv file')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='Also record tracemalloc peaks per stage (slower)')
+    args = parser.parse_args()
+
+    if args.volume:
+        analyse_volume(args)
+        return
+
+    if args.watch:
+        tiled_kwargs = {'tile': args.tile, 'max_pore_radius': args.max_pore_radius} if args.tile else {}
+        if args.pore_tables:
+            os.makedirs(args.pore_tables, exist_ok=True)
+        figure_path = os.path.splitext(args.results_table)[0] + '_psd.png'
+        watch(args.image_dir, args.results_table, figure_path, args.watch_interval, args.workers,
+              None if args.no_cache else SegmentationCache(args.cache_dir), args.pore_tables, args.pore_size_mode,
+              **tiled_kwargs)
+        return
+
+    if args.all:
+        image_paths = list_images(args.image_dir)
+    else:
+        image_paths = [os.path.join(args.image_dir, image_file) for image_file in image_files]
+
+    # Process all images, reporting each one as it finishes
+    tiled_kwargs = {'tile': args.tile, 'max_pore_radius': args.max_pore_radius} if args.tile else {}
+    cache = None if args.no_cache else SegmentationCache(args.cache_dir)
+    if args.pore_tables:
+        os.makedirs(args.pore_tables, exist_ok=True)
+    profiler = StageProfiler(track_memory=args.profile_memory) if args.profile else DISABLED
+    results = process_images(image_paths, args.workers, cache, args.pore_tables, profiler, args.pore_size_mode,
+                             **tiled_kwargs)
+    results_by_path = {}
+    for done, (image_path, result) in enumerate(results, start=1):
+        results_by_path[image_path] = result
+        print(f"[{done}/{len(image_paths)}] {os.path.basename(image_path)}: {result[1].regions.max()} regions")
+
+    if args.profile:
+        profiler.write(args.profile)
+        print(profiler.summary().to_string(index=False))
+
+    if args.all:
+        return
+
+    # Keep the figure order of image_files
+    results = [results_by_path[image_path] for image_path in image_paths]
+    plot_composite(results, labels, dpi=600)
+
+    # Save the figure with at least 600 DPI
+    plt.savefig('sem_analysis_composite.png', dpi=600, bbox_inches='tight',
+                pad_inches=0.1, format='png')
+    plt.savefig('sem_analysis_composite.tif', dpi=600, bbox_inches='tight',
+                pad_inches=0.1, format='tiff', pil_kwargs={'compression': 'tiff_lzw'})
+
+    # Optionally, also show the plot
+    plt.show()
+
+
+if __name__ == '__main__':
+    main()
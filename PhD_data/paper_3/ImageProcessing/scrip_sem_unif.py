@@ -1,49 +1,51 @@
 import matplotlib.pyplot as plt
-from skimage import io, feature, color
-from skimage.feature import graycomatrix, graycoprops
+from sem_io import load_image
+from sem_orientation import orientation_table
+from sem_preview import imshow_preview
+from sem_texture import texture_maps, texture_table
 
-# Load your SEM images
-image1 = io.imread('BNC_surface_10kv_5kx_1-tif.tif')
-image2 = io.imread('BNCPHB2_surface_10kv_5kx_1.tif')
-image3 = io.imread('BNCPHB5_surface_10kv_5kx_1.tif')
-image4 = io.imread('BNCPHB10_surface_10kv_5kx_1.tif')
-
-# Create a list to store the images for easier processing
-images = [image1, image2, image3, image4]
+# SEM images, loaded (memory-mapped where possible) only when needed
+image_files = [
+    'BNC_surface_10kv_5kx_1-tif.tif',
+    'BNCPHB2_surface_10kv_5kx_1.tif',
+    'BNCPHB5_surface_10kv_5kx_1.tif',
+    'BNCPHB10_surface_10kv_5kx_1.tif'
+]
 image_names = ['BNC', 'BNCPHB2', 'BNCPHB5', 'BNCPHB10']
 
-# Function to calculate texture features
-def analyze_texture(image):
-    if len(image.shape) > 2:
-        image = color.rgb2gray(image)
-    
-    image = (image * 255).astype('uint8')
-    
-    glcm = graycomatrix(image, distances=[1], angles=[0], levels=256, symmetric=True, normed=True)
-
-    contrast = graycoprops(glcm, 'contrast')[0, 0]
-    homogeneity = graycoprops(glcm, 'homogeneity')[0, 0]
+# GLCM settings: all four standard angles at each distance. Use 32 or 64
+# gray levels for smaller matrices and faster runs over many fields.
+texture_distances = [1, 2, 4]
+texture_levels = 256
 
-    return contrast, homogeneity
+# Fiber orientation from FFT power spectra averaged over 128 px windows:
+# dominant orientation (degrees), anisotropy index (0-1) and dominant
+# fiber spacing (pixels) per image
+orientation_window = 128  # pixels
+orientation, orientation_distribution = orientation_table(image_files, image_names, window=orientation_window,
+                                                          stride=orientation_window // 2)
 
-# Analyze each image and store the features
-texture_features = []
-for img in images:
-    features = analyze_texture(img)
-    texture_features.append(features)
+# Analyze all images; the full table has every Haralick feature per image,
+# distance and angle, with the orientation results of each image alongside
+texture_features = texture_table(image_files, image_names, distances=texture_distances, levels=texture_levels)
+texture_features = texture_features.merge(orientation, on='image')
+texture_features.to_csv('sem_texture_features.csv', index=False)
 
-# Separate the features for plotting
-contrast = [f[0] for f in texture_features]
-homogeneity = [f[1] for f in texture_features]
+# Contrast and homogeneity at distance 1, angle 0 for the bar charts
+selected = texture_features[(texture_features['distance'] == 1) & (texture_features['angle'] == 0)]
+contrast = list(selected['contrast'])
+homogeneity = list(selected['homogeneity'])
 
 # Create a figure with custom layout
 fig = plt.figure(figsize=(12, 14))
 gs = fig.add_gridspec(5, 2, height_ratios=[2, 2, 0.1, 1, 0.1])
 
-# Plot SEM images
-for i, (img, name) in enumerate(zip(images, image_names)):
+# Plot SEM images, each from the pyramid level matching its panel size at
+# figure_dpi (the resolution the figure is saved at)
+figure_dpi = 300
+for i, (image_file, name) in enumerate(zip(image_files, image_names)):
     ax = fig.add_subplot(gs[i // 2, i % 2])
-    ax.imshow(img, cmap='gray')
+    imshow_preview(ax, load_image(image_file), figure_dpi, cmap='gray')
     ax.set_title(name)
     ax.axis('off')
 
@@ -61,9 +63,41 @@ ax_contrast.set_title('Contrast')
 ax_contrast.set_ylabel('Value')
 ax_contrast.tick_params(axis='x', rotation=45)
 
-# Adjust layout and display
+# Adjust layout
 plt.tight_layout()
+
+# Local homogeneity maps over sliding windows, to show where each surface is
+# non-uniform. The coefficient of variation of the map summarises it.
+map_window = 64  # pixels
+map_stride = 32  # pixels
+fig_maps, axes_maps = plt.subplots(1, len(image_files), figsize=(16, 4))
+for ax, image_file, name in zip(axes_maps, image_files, image_names):
+    maps, row_centres, col_centres = texture_maps(load_image(image_file), window=map_window, stride=map_stride)
+    local_homogeneity = maps['homogeneity']
+    extent = [col_centres[0] - map_stride / 2, col_centres[-1] + map_stride / 2,
+              row_centres[-1] + map_stride / 2, row_centres[0] - map_stride / 2]
+    shown = ax.imshow(local_homogeneity, cmap='viridis', extent=extent)
+    cv = local_homogeneity.std() / local_homogeneity.mean()
+    ax.set_title(f'{name} (CV {cv:.3f})')
+    ax.axis('off')
+    fig_maps.colorbar(shown, ax=ax, fraction=0.046, pad=0.04)
+fig_maps.suptitle(f'Local homogeneity ({map_window} px windows)')
+fig_maps.tight_layout()
+
+# Fiber orientation distributions, with each sample's anisotropy index
+fig_orientation, ax_orientation = plt.subplots(figsize=(6, 4))
+for name, row in zip(image_names, orientation.itertuples()):
+    distribution = orientation_distribution[orientation_distribution['image'] == name]
+    ax_orientation.plot(distribution['angle'], distribution['density'],
+                        label=f'{name} (anisotropy {row.anisotropy:.2f})')
+ax_orientation.set_xlim(0, 180)
+ax_orientation.set_xlabel('Fiber orientation (degrees)')
+ax_orientation.set_ylabel('Density')
+ax_orientation.legend()
+fig_orientation.tight_layout()
+
+# Display
 plt.show()
 
 # Optionally, save the figure
-# plt.savefig('sem_images_and_texture_analysis.png', dpi=300, bbox_inches='tight')
+# fig.savefig('sem_images_and_texture_analysis.png', dpi=figure_dpi, bbox_inches='tight')
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import zipfile
+
+import numpy as np
+import porespy as ps
+from porespy.tools import Results
+
+# Bump when the layout of cached entries changes so old entries are ignored
+CACHE_VERSION = 2
+
+PSD_FIELDS = ('bin_centers', 'bin_edges', 'bin_widths', 'pdf', 'cdf', 'satn')
+
+
+# SHA-1 of a file's bytes, read in blocks so large mosaics are never held in
+# memory
+def file_digest(path, block_size=1024 ** 2):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SegmentationCache:
+    """On-disk cache of SNOW regions, porosimetry maps and pore-size distributions.
+
+    Entries are compressed .npz files named by a hash of the image file's
+    contents, the pixel scale and the processing parameters, so a rerun that
+    only changes the figure skips the segmentation. Porosimetry maps are
+    stored as float32. The directory is kept
+    under `max_bytes` by evicting the least recently used entries (reads
+    refresh an entry's modification time).
+    """
+
+    def __init__(self, directory='.sem_cache', max_bytes=2 * 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        digest = hashlib.sha1(f'v{CACHE_VERSION}|porespy {ps.__version__}'.encode())
+        for part in parts:
+            digest.update(repr(part).encode())
+            digest.update(b'|')
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    # (snow, mip, psd) for a cached image, with snow holding only `regions`,
+    # or None on a miss. The mip map is only decompressed with mip=True and
+    # is None otherwise, since most callers only need the regions and PSD.
+    def get(self, key, mip=False):
+        path = self._path(key)
+        try:
+            with np.load(path) as entry:
+                snow = Results()
+                snow.regions = entry['regions']
+                mip = entry['mip'] if mip else None
+                psd = Results()
+                for field in PSD_FIELDS:
+                    psd[field] = entry[f'psd_{field}']
+                psd[str(entry['psd_radius_name'])] = psd.bin_centers
+        except (FileNotFoundError, KeyError, ValueError, EOFError, OSError, zipfile.BadZipFile):
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return snow, mip, psd
+
+    def put(self, key, snow, mip, psd):
+        arrays = {f'psd_{field}': np.asarray(psd[field]) for field in PSD_FIELDS}
+        arrays['psd_radius_name'] = np.array('LogR' if hasattr(psd, 'LogR') else 'R')
+
+        path = self._path(key)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, regions=snow.regions, mip=np.asarray(mip, dtype=np.float32), **arrays)
+        os.replace(tmp_path, path)
+
+        self._size = self.size() if self._size is None else self._size + os.path.getsize(path) - previous
+        if self._size > self.max_bytes:
+            self.evict()
+
+    # (mtime, size, path) of every entry. Other processes sharing the
+    # directory may remove entries while it is being scanned.
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._size = total
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                os.remove(entry.path)
+        self._size = 0
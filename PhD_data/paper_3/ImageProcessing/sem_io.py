@@ -0,0 +1,153 @@
+import os
+
+import numpy as np
+from skimage import color, io
+
+
+# Read an SEM image. Uncompressed TIFFs are memory-mapped, so pixels are only
+# read from disk when used. A compressed or tiled multi-page TIFF comes back
+# as a SliceStack over its pages, which decodes one page per slice asked for;
+# a single compressed page is decoded on its own. Other formats, or a missing
+# tifffile, fall back to reading the whole file.
+def load_image(path, mmap=True):
+    if path.lower().endswith(('.tif', '.tiff')):
+        try:
+            import tifffile
+        except ImportError:
+            return io.imread(path)
+        if mmap:
+            try:
+                return tifffile.memmap(path, mode='r')
+            except ValueError:
+                pass
+        pages = tifffile.TiffFile(path).pages
+        if len(pages) > 1:
+            return SliceStack(list(pages), mmap)
+        return pages[0].asarray()
+    return io.imread(path)
+
+
+# Whether an image file is a 3-D stack rather than one grayscale or RGB
+# image, from the TIFF header alone (pixels are not decoded). Files that are
+# not TIFFs, or a missing tifffile, count as single images.
+def is_stack(path):
+    if not path.lower().endswith(('.tif', '.tiff')):
+        return False
+    try:
+        import tifffile
+    except ImportError:
+        return False
+    with tifffile.TiffFile(path) as tif:
+        series = tif.series[0]
+        return len(series.shape) - ('S' in series.axes) > 2
+
+
+# Start/stop rows covering an image in slabs of `rows` rows
+def row_slabs(n_rows, rows=1024):
+    for start in range(0, n_rows, rows):
+        yield start, min(start + rows, n_rows)
+
+
+# Rows (slices, for a volume) per slab so that one slab holds about `voxels`
+# elements
+def slab_rows(shape, voxels=2 ** 24):
+    return max(1, voxels // int(np.prod(shape[1:])))
+
+
+class SliceStack:
+    """Read-only 3-D volume whose slices are read from disk when indexed.
+
+    Sources are slice image paths (memory-mapped where possible, see
+    load_image), 2-D/RGB arrays such as the pages of a memory-mapped TIFF
+    stack, or tifffile pages, which are decoded when indexed. Indexing along
+    the first axis reads and stacks only the slices asked for, reduced to
+    grayscale with to_gray, so the volume is never held in memory as a
+    whole.
+    """
+
+    def __init__(self, sources, mmap=True):
+        self.sources = list(sources)
+        self.mmap = mmap
+        first = self._slice(0)
+        self.shape = (len(self.sources),) + first.shape
+        self.dtype = first.dtype
+        self.ndim = 3
+        self.size = int(np.prod(self.shape))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _slice(self, i):
+        source = self.sources[i]
+        if isinstance(source, (str, os.PathLike)):
+            source = load_image(os.fspath(source), self.mmap)
+        elif hasattr(source, 'asarray'):
+            source = source.asarray()
+        return to_gray(source)
+
+    def __getitem__(self, index):
+        index = index if isinstance(index, tuple) else (index,)
+        first, rest = index[0], index[1:]
+        if isinstance(first, slice):
+            return np.stack([np.asarray(self._slice(i)[rest]) for i in range(*first.indices(len(self)))])
+        return np.asarray(self._slice(first)[rest])
+
+
+# A 3-D volume from a multi-page TIFF (memory-mapped where possible, RGB
+# pages reduced to gray on access) or from a directory of slice images
+# sorted by name. Uncompressed grayscale TIFF stacks come back as memory-mapped
+# arrays, everything else as a SliceStack, so no volume is read as a whole.
+def load_stack(path, mmap=True, extensions=('.tif', '.tiff', '.png', '.jpg', '.jpeg', '.bmp')):
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path) if name.lower().endswith(extensions))
+        if not names:
+            raise ValueError(f'no slice images in {path}')
+        return SliceStack([os.path.join(path, name) for name in names], mmap)
+    volume = load_image(path, mmap)
+    if isinstance(volume, SliceStack):
+        return volume
+    if volume.ndim == 4:
+        return SliceStack(volume, mmap)
+    if volume.ndim != 3:
+        raise ValueError(f'{path} is not an image stack (shape {volume.shape})')
+    return volume
+
+
+# Channel mean of an RGB(A) image as float32, one slab at a time, so the
+# full-size float64 array from im.mean(axis=2) is never built. Grayscale
+# images are returned unchanged, keeping their own dtype (usually uint8).
+# Anything else, such as a grayscale stack, is refused rather than averaged.
+def to_gray(im, rows=1024):
+    if im.ndim == 2:
+        return im
+    if im.ndim != 3 or im.shape[-1] not in (3, 4):
+        raise ValueError(f'not a grayscale or RGB image (shape {im.shape}); read 3-D stacks with load_stack')
+    gray = np.empty(im.shape[:2], dtype=np.float32)
+    for start, stop in row_slabs(im.shape[0], rows):
+        gray[start:stop] = im[start:stop].mean(axis=2, dtype=np.float32)
+    return gray
+
+
+# Pixels brighter than the image mean. The mean is accumulated in float64
+# slab by slab and the comparison writes straight into a boolean array, or
+# into `out` (e.g. a np.memmap for a volume too large for memory).
+def threshold_mean(gray, rows=1024, out=None):
+    total = 0.0
+    for start, stop in row_slabs(gray.shape[0], rows):
+        total += gray[start:stop].sum(dtype=np.float64)
+    mean = total / gray.size
+
+    binary = np.empty(gray.shape, dtype=bool) if out is None else out
+    for start, stop in row_slabs(gray.shape[0], rows):
+        np.greater(gray[start:stop], mean, out=binary[start:stop])
+    return binary
+
+
+# skimage's rgb2gray scaled to 0-255 and truncated to uint8, as used for the
+# texture features, computed per slab. The float64 temporaries only ever
+# hold `rows` rows, and the result is identical to the whole-image version.
+def rgb_to_gray_uint8(im, rows=1024):
+    gray = np.empty(im.shape[:2], dtype=np.uint8)
+    for start, stop in row_slabs(im.shape[0], rows):
+        gray[start:stop] = (color.rgb2gray(im[start:stop]) * 255).astype('uint8')
+    return gray
@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import ndimage
+
+# Mean ratio of true boundary length (2-D) or area (3-D) to the number of
+# pixel edges or voxel faces on it, for isotropically oriented boundaries
+BOUNDARY_CORRECTION = {2: np.pi / 4, 3: 2 / 3}
+AXIS_NAMES = {2: ('row', 'col'), 3: ('slice', 'row', 'col')}
+
+
+# The label image without the boundary padding snow2 adds (shape is the
+# shape of the image that was segmented)
+def crop_padding(regions, shape):
+    pad = [(outer - inner) // 2 for outer, inner in zip(regions.shape, shape)]
+    return regions[tuple(slice(p, p + size) for p, size in zip(pad, shape))]
+
+
+# Number of pixel edges (voxel faces) on the boundary of every label: faces
+# between two different labels count once for each, faces on the image
+# border count for the label inside
+def boundary_faces(regions, n_labels):
+    faces = np.zeros(n_labels + 1, dtype=np.int64)
+    for axis in range(regions.ndim):
+        first = np.take(regions, np.arange(regions.shape[axis] - 1), axis=axis)
+        second = np.take(regions, np.arange(1, regions.shape[axis]), axis=axis)
+        change = first != second
+        faces += np.bincount(first[change], minlength=n_labels + 1)
+        faces += np.bincount(second[change], minlength=n_labels + 1)
+        for edge in (0, -1):
+            faces += np.bincount(np.take(regions, edge, axis=axis).ravel(), minlength=n_labels + 1)
+    return faces
+
+
+# One row per region of a 2-D or 3-D label image: pixel count, area (volume),
+# equivalent circle (sphere) diameter, boundary length (area) estimated from
+# the edge count, centroid in pixels and the largest value of a local
+# thickness map inside the region. Every statistic is a single bincount or
+# ndimage reduction over all labels at once. Lengths are in the units of
+# voxel_size. Label 0 is background.
+def pore_metrics(regions, thickness=None, voxel_size=1):
+    regions = np.asarray(regions)
+    ndim = regions.ndim
+    flat = regions.ravel()
+    n_labels = int(flat.max())
+    labels = np.arange(1, n_labels + 1)
+
+    pixels = np.bincount(flat, minlength=n_labels + 1)
+    present = pixels[1:] > 0
+    table = {'label': labels, 'pixels': pixels[1:]}
+
+    size = pixels[1:] * float(voxel_size) ** ndim
+    if ndim == 2:
+        table['area'] = size
+        table['equivalent_diameter'] = 2 * np.sqrt(size / np.pi)
+        boundary_name = 'perimeter'
+    else:
+        table['volume'] = size
+        table['equivalent_diameter'] = np.cbrt(6 * size / np.pi)
+        boundary_name = 'surface_area'
+    faces = boundary_faces(regions, n_labels)[1:]
+    table[boundary_name] = faces * BOUNDARY_CORRECTION[ndim] * float(voxel_size) ** (ndim - 1)
+
+    # Centroids: coordinate sums per label, one axis at a time
+    counts = np.maximum(pixels[1:], 1)
+    for axis, name in enumerate(AXIS_NAMES[ndim]):
+        shape = [1] * ndim
+        shape[axis] = regions.shape[axis]
+        coordinate = np.broadcast_to(np.arange(regions.shape[axis]).reshape(shape), regions.shape)
+        table[f'centroid_{name}'] = np.bincount(flat, weights=coordinate.ravel(), minlength=n_labels + 1)[1:] / counts
+
+    if thickness is not None:
+        table['local_thickness_max'] = ndimage.maximum(thickness, regions, labels) * float(voxel_size)
+
+    return pd.DataFrame(table)[present].reset_index(drop=True)
+
+
+# Write a pore table as Parquet or Feather (columnar) or CSV, chosen by the
+# file extension
+def write_pore_table(table, path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        table.to_parquet(path, index=False)
+    elif extension in ('.feather', '.arrow'):
+        table.to_feather(path)
+    else:
+        table.to_csv(path, index=False)
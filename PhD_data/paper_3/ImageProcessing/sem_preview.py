@@ -0,0 +1,79 @@
+import numpy as np
+
+
+class ImagePyramid:
+    """Power-of-two downsampled levels of an image, built on demand.
+
+    Level k has 1/2**k of the resolution of the original (level 0). Gray and
+    RGB images are reduced by block means, computed in row slabs so a
+    memory-mapped image is never loaded whole, and integer images stay
+    integer (imshow expects float RGB in 0-1). Label images (labels=True) are
+    subsampled so region ids are never mixed. Levels are cached once built.
+    """
+
+    def __init__(self, image, labels=False, slab=1024):
+        self.image = image
+        self.labels = labels
+        self.slab = slab
+        self._levels = {0: image}
+
+    @property
+    def shape(self):
+        return self.image.shape[:2]
+
+    def level(self, k):
+        if k not in self._levels:
+            self._levels[k] = self._downsample(2 ** k)
+        return self._levels[k]
+
+    def _downsample(self, factor):
+        if self.labels:
+            return np.ascontiguousarray(self.image[::factor, ::factor])
+        rows, cols = self.shape[0] // factor, self.shape[1] // factor
+        integer = np.issubdtype(self.image.dtype, np.integer)
+        out = np.empty((rows, cols) + self.image.shape[2:], dtype=self.image.dtype if integer else np.float32)
+        step = max(1, self.slab // factor)
+        for start in range(0, rows, step):
+            stop = min(start + step, rows)
+            block = np.asarray(self.image[start * factor:stop * factor, :cols * factor], dtype=np.float32)
+            block = block.reshape((stop - start, factor, cols, factor) + self.image.shape[2:])
+            block = block.mean(axis=(1, 3))
+            out[start:stop] = np.rint(block) if integer else block
+        return out
+
+    # Coarsest level that still has at least `width` x `height` pixels (the
+    # panel's size in the saved figure), so nothing visible is lost
+    def level_for(self, width, height):
+        scale = min(self.shape[1] / max(width, 1), self.shape[0] / max(height, 1))
+        k = int(np.floor(np.log2(scale))) if scale >= 2 else 0
+        return k, self.level(k)
+
+    # Extent (left, right, bottom, top) of a level in full-resolution pixel
+    # coordinates, with the same orientation as imshow's default. Overlays
+    # such as scale bars drawn in full-resolution pixels stay where they were.
+    def extent(self, k, left=0, right=None, bottom=None, top=0):
+        right = self.shape[1] if right is None else right
+        bottom = self.shape[0] if bottom is None else bottom
+        factor = 2 ** k
+        covered_cols = (self.shape[1] // factor) * factor if k else self.shape[1]
+        covered_rows = (self.shape[0] // factor) * factor if k else self.shape[0]
+        return [left, left + (right - left) * covered_cols / self.shape[1],
+                top + (bottom - top) * covered_rows / self.shape[0], top]
+
+
+# Size of an axes in pixels when its figure is saved at `dpi`
+def panel_pixels(ax, dpi):
+    position = ax.get_position()
+    width, height = ax.figure.get_size_inches()
+    return position.width * width * dpi, position.height * height * dpi
+
+
+# imshow of the pyramid level matching the panel's size at `dpi`. `extent`
+# is given in full-resolution pixel coordinates as for the original image.
+def imshow_preview(ax, image, dpi, labels=False, extent=None, **kwargs):
+    pyramid = image if isinstance(image, ImagePyramid) else ImagePyramid(image, labels=labels)
+    k, preview = pyramid.level_for(*panel_pixels(ax, dpi))
+    extent = pyramid.extent(k) if extent is None else pyramid.extent(k, *extent)
+    if pyramid.labels:
+        kwargs.setdefault('interpolation', 'nearest')
+    return ax.imshow(preview, extent=extent, **kwargs)
@@ -0,0 +1,151 @@
+import contextlib
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+# ru_maxrss is in kilobytes on Linux and bytes on macOS
+_RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+_DISABLED_STAGE = contextlib.nullcontext()
+
+
+# Resident set size high-water mark of this process in bytes (Linux's
+# VmHWM), or None where /proc is not available
+def _rss_peak():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+# Reset the high-water mark to the current RSS (Linux 4.0+). Returns whether
+# that worked.
+def _reset_rss_peak():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class StageProfiler:
+    """Wall time, CPU time and memory per pipeline stage and image.
+
+    Use `with profiler.stage('snow2', image=name):` around each step. Every
+    stage appends one record with wall and CPU seconds, the peak RSS during
+    the stage (peak_rss_bytes; Linux only, None elsewhere) and the process's
+    peak RSS since it started (process_peak_rss_bytes, which is not a
+    per-stage figure). With track_memory it also records the peak bytes
+    traced by tracemalloc during the stage (slower). A disabled profiler hands out one
+    shared no-op context, so instrumented code costs next to nothing when
+    profiling is off.
+    """
+
+    def __init__(self, enabled=True, track_memory=False):
+        self.enabled = enabled
+        self.track_memory = track_memory
+        self.records = []
+        self._peaks = []
+        self._rss_peaks = []
+        self._process_peak = None
+
+    def stage(self, name, **labels):
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return self._stage(name, labels)
+
+    @contextlib.contextmanager
+    def _stage(self, name, labels):
+        tracing = self.track_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if self.track_memory:
+            # Resetting the peak for this stage loses the enclosing stage's
+            # peak so far, so keep it on a stack and fold it back in on exit
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            self._peaks.append(0)
+            tracemalloc.reset_peak()
+        # The RSS high-water mark is reset for each stage, with the same
+        # stack as the tracemalloc peaks so enclosing stages keep theirs.
+        # Resetting it also resets ru_maxrss, so the process peak is kept
+        # here from the marks seen before each reset.
+        before = _rss_peak()
+        self._process_peak = _max(self._process_peak, before)
+        if self._rss_peaks:
+            self._rss_peaks[-1] = _max(self._rss_peaks[-1], before)
+        self._rss_peaks.append(_rss_peak() if _reset_rss_peak() else None)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            rss_peak = self._rss_peaks.pop()
+            if rss_peak is not None:
+                rss_peak = _max(rss_peak, _rss_peak())
+                if self._rss_peaks:
+                    self._rss_peaks[-1] = _max(self._rss_peaks[-1], rss_peak)
+            self._process_peak = _max(self._process_peak,
+                                      resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT)
+            record = {'stage': name, **labels, 'pid': os.getpid(),
+                      'wall_s': time.perf_counter() - wall, 'cpu_s': time.process_time() - cpu,
+                      'peak_rss_bytes': rss_peak, 'process_peak_rss_bytes': self._process_peak,
+                      'traced_peak_bytes': None}
+            if self.track_memory:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                record['traced_peak_bytes'] = peak
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+            if tracing:
+                tracemalloc.stop()
+            self.records.append(record)
+
+    # Records from another profiler, e.g. one that ran in a worker process
+    def extend(self, records):
+        self.records.extend(records)
+
+    def to_frame(self):
+        return pd.DataFrame(self.records)
+
+    # Totals per stage over all images: count, wall and CPU seconds, and the
+    # largest per-stage memory peaks
+    def summary(self):
+        frame = self.to_frame()
+        if frame.empty:
+            return frame
+        return frame.groupby('stage', sort=False).agg(
+            count=('wall_s', 'size'), wall_s=('wall_s', 'sum'), mean_wall_s=('wall_s', 'mean'),
+            cpu_s=('cpu_s', 'sum'), peak_rss_bytes=('peak_rss_bytes', 'max'),
+            traced_peak_bytes=('traced_peak_bytes', 'max')).reset_index()
+
+    # Write the records as CSV, or as JSON with the machine and library
+    # versions, chosen by the file extension
+    def write(self, path):
+        if path.lower().endswith('.csv'):
+            self.to_frame().to_csv(path, index=False)
+            return
+        import numpy as np
+        import porespy as ps
+        report = {'python': platform.python_version(), 'numpy': np.__version__, 'porespy': ps.__version__,
+                  'machine': platform.machine(), 'cpus': os.cpu_count(), 'records': self.records}
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+# max() that ignores a missing (None) value
+def _max(a, b):
+    return a if b is None else b if a is None else max(a, b)
+
+
+# Shared disabled profiler, the default for instrumented functions
+DISABLED = StageProfiler(enabled=False)
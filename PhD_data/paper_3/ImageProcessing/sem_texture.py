@@ -0,0 +1,249 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from sem_io import load_image, rgb_to_gray_uint8
+
+# The four standard GLCM directions: 0, 45, 90 and 135 degrees
+STANDARD_ANGLES = (0, np.pi / 4, np.pi / 2, 3 * np.pi / 4)
+
+# Same names and definitions as skimage's graycoprops, followed by the
+# remaining Haralick features
+PROPERTIES = ('contrast', 'dissimilarity', 'homogeneity', 'ASM', 'energy', 'correlation', 'mean', 'variance',
+              'std', 'entropy', 'max_probability', 'cluster_shade', 'cluster_prominence', 'sum_average',
+              'sum_variance', 'sum_entropy', 'difference_variance', 'difference_entropy', 'imc1', 'imc2')
+
+
+# 8-bit grayscale version of an SEM image. RGB is reduced as skimage's
+# rgb2gray, 2-D uint8 is used as is, other integer images are scaled by their
+# dtype's range and floats are taken to span 0-1.
+def to_uint8(image):
+    image = np.asarray(image)
+    if image.ndim > 2:
+        return rgb_to_gray_uint8(image)
+    if image.dtype == np.uint8:
+        return image
+    if np.issubdtype(image.dtype, np.integer):
+        return (image.astype(np.float32) * (255 / np.iinfo(image.dtype).max)).astype(np.uint8)
+    return (np.clip(image, 0, 1) * 255).astype(np.uint8)
+
+
+# Requantize 8-bit gray levels to `levels` equal-width bins (levels <= 256)
+def quantize(gray, levels=64):
+    if levels == 256:
+        return gray
+    return ((gray.astype(np.uint16) * levels) >> 8).astype(np.uint8)
+
+
+# (row, column) pixel offset for one distance and angle, with skimage's
+# convention so the matrices match graycomatrix
+def offset(distance, angle):
+    return int(np.round(np.sin(angle) * distance)), int(np.round(np.cos(angle) * distance))
+
+
+# The two overlapping views of an image whose aligned pixels are the
+# co-occurring pairs at offset (dr, dc)
+def pair_views(image, dr, dc):
+    rows, cols = image.shape[-2:]
+    first = image[..., max(0, -dr):rows - max(0, dr), max(0, -dc):cols - max(0, dc)]
+    second = image[..., max(0, dr):rows - max(0, -dr), max(0, dc):cols - max(0, -dc)]
+    return first, second
+
+
+# Gray-level co-occurrence matrices for every distance and angle at once, in
+# graycomatrix's (levels, levels, distances, angles) layout. Each matrix is a
+# single bincount over the pair codes i * levels + j, which is much faster
+# than the per-pixel loop when several offsets are needed.
+def glcm(image, distances=(1,), angles=STANDARD_ANGLES, levels=256, symmetric=True, normed=True):
+    image = np.asarray(image)
+    P = np.zeros((levels, levels, len(distances), len(angles)), dtype=np.float64 if normed else np.uint32)
+    for d, distance in enumerate(distances):
+        for a, angle in enumerate(angles):
+            first, second = pair_views(image, *offset(distance, angle))
+            codes = first.astype(np.int32) * levels + second
+            P[:, :, d, a] = np.bincount(codes.ravel(), minlength=levels * levels).reshape(levels, levels)
+
+    if symmetric:
+        P = P + P.transpose(1, 0, 2, 3)
+    if normed:
+        sums = P.sum(axis=(0, 1), keepdims=True)
+        sums[sums == 0] = 1
+        P = P / sums
+    return P
+
+
+# Haralick texture features of normalized co-occurrence matrices with shape
+# (levels, levels, ...). Returns a dict of arrays shaped like the trailing
+# axes. Properties shared with graycoprops use its definitions (natural log
+# for the entropies, correlation of 1 for flat matrices).
+def glcm_properties(P, properties=PROPERTIES):
+    levels = P.shape[0]
+    extra = (1,) * (P.ndim - 2)
+    I = np.arange(levels, dtype=np.float64).reshape((levels, 1) + extra)
+    J = np.arange(levels, dtype=np.float64).reshape((1, levels) + extra)
+
+    def plogp(p, axis):
+        return -np.sum(p * np.log(p, where=p > 0, out=np.zeros_like(p)), axis=axis)
+
+    mean_i, mean_j = np.sum(I * P, axis=(0, 1)), np.sum(J * P, axis=(0, 1))
+    var_i = np.sum(P * (I - mean_i) ** 2, axis=(0, 1))
+    var_j = np.sum(P * (J - mean_j) ** 2, axis=(0, 1))
+    cov = np.sum(P * (I - mean_i) * (J - mean_j), axis=(0, 1))
+    flat = (np.sqrt(var_i) < 1e-15) | (np.sqrt(var_j) < 1e-15)
+
+    # Distributions of i + j (anti-diagonals) and |i - j| (diagonals)
+    flipped = P[::-1]
+    p_sum = np.stack([np.trace(flipped, offset=value - levels + 1) for value in range(2 * levels - 1)])
+    p_diff = np.stack([np.trace(P)] + [np.trace(P, offset=value) + np.trace(P, offset=-value)
+                                       for value in range(1, levels)])
+    k = np.arange(2 * levels - 1, dtype=np.float64).reshape((-1,) + extra)
+    sum_average = np.sum(k * p_sum, axis=0)
+    diff_mean = np.sum(k[:levels] * p_diff, axis=0)
+
+    # Marginals for the information measures of correlation
+    px, py = P.sum(axis=1), P.sum(axis=0)
+    hxy = plogp(P, axis=(0, 1))
+    outer = px[:, None] * py[None, :]
+    hxy1 = -np.sum(P * np.log(outer, where=outer > 0, out=np.zeros_like(outer)), axis=(0, 1))
+    hxy2 = plogp(outer, axis=(0, 1))
+    hx, hy = plogp(px, axis=0), plogp(py, axis=0)
+
+    values = {
+        'contrast': lambda: np.sum(P * (I - J) ** 2, axis=(0, 1)),
+        'dissimilarity': lambda: np.sum(P * np.abs(I - J), axis=(0, 1)),
+        'homogeneity': lambda: np.sum(P / (1 + (I - J) ** 2), axis=(0, 1)),
+        'ASM': lambda: np.sum(P ** 2, axis=(0, 1)),
+        'energy': lambda: np.sqrt(np.sum(P ** 2, axis=(0, 1))),
+        'correlation': lambda: np.where(flat, 1.0, cov / np.where(flat, 1.0, np.sqrt(var_i * var_j))),
+        'mean': lambda: mean_i,
+        'variance': lambda: var_i,
+        'std': lambda: np.sqrt(var_i),
+        'entropy': lambda: hxy,
+        'max_probability': lambda: P.max(axis=(0, 1)),
+        'cluster_shade': lambda: np.sum(P * (I + J - mean_i - mean_j) ** 3, axis=(0, 1)),
+        'cluster_prominence': lambda: np.sum(P * (I + J - mean_i - mean_j) ** 4, axis=(0, 1)),
+        'sum_average': lambda: sum_average,
+        'sum_variance': lambda: np.sum((k - sum_average) ** 2 * p_sum, axis=0),
+        'sum_entropy': lambda: plogp(p_sum, axis=0),
+        'difference_variance': lambda: np.sum((k[:levels] - diff_mean) ** 2 * p_diff, axis=0),
+        'difference_entropy': lambda: plogp(p_diff, axis=0),
+        'imc1': lambda: np.where(np.maximum(hx, hy) > 0, (hxy - hxy1) / np.maximum(np.maximum(hx, hy), 1e-300), 0.0),
+        'imc2': lambda: np.sqrt(np.clip(1 - np.exp(-2 * (hxy2 - hxy)), 0, None)),
+    }
+    return {name: values[name]() for name in properties}
+
+
+# Texture features of one image (array or file path) as rows of
+# (distance, angle, properties...)
+def image_texture(image, distances=(1,), angles=STANDARD_ANGLES, levels=64, properties=PROPERTIES):
+    if isinstance(image, (str, os.PathLike)):
+        image = load_image(image)
+    gray = quantize(to_uint8(image), levels)
+    props = glcm_properties(glcm(gray, distances, angles, levels), properties)
+
+    rows = []
+    for d, distance in enumerate(distances):
+        for a, angle in enumerate(angles):
+            rows.append({'distance': distance, 'angle': np.degrees(angle),
+                         **{name: float(value[d, a]) for name, value in props.items()}})
+    return rows
+
+
+# Texture features for a batch of images as one DataFrame with a row per
+# image, distance and angle. Images may be arrays or paths; paths are loaded
+# lazily inside the workers. With average_angles the four directions are
+# averaged into one rotation-invariant row per image and distance.
+def texture_table(images, names=None, distances=(1,), angles=STANDARD_ANGLES, levels=64, properties=PROPERTIES,
+                  average_angles=False, n_workers=1):
+    images = list(images)
+    if names is None:
+        names = [os.path.basename(image) if isinstance(image, str) else i for i, image in enumerate(images)]
+    args = (distances, angles, levels, properties)
+
+    if n_workers == 1:
+        per_image = [image_texture(image, *args) for image in images]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            per_image = list(pool.map(image_texture, images, *[[arg] * len(images) for arg in args],
+                                      chunksize=max(1, len(images) // (4 * (n_workers or os.cpu_count())))))
+
+    table = pd.DataFrame([{'image': name, **row} for name, rows in zip(names, per_image) for row in rows])
+    if average_angles:
+        table = table.drop(columns='angle').groupby(['image', 'distance'], sort=False).mean().reset_index()
+    return table
+
+
+# Sliding-window texture maps: GLCM features of every window x window patch,
+# with the window moved by `stride` pixels, averaged over the angles. For each
+# offset the co-occurrence counts are kept per column and updated
+# incrementally as the window steps down the image (adding the rows that
+# enter, removing the rows that leave), and the window's counts are updated
+# the same way from those column histograms as it steps across. Returns a
+# dict of (n_window_rows, n_window_cols) maps and the pixel centres of the
+# windows along each axis.
+def texture_maps(image, window=64, stride=16, distance=1, angles=STANDARD_ANGLES, levels=32,
+                 properties=('contrast', 'homogeneity', 'energy', 'correlation', 'entropy')):
+    if isinstance(image, (str, os.PathLike)):
+        image = load_image(image)
+    gray = quantize(to_uint8(image), levels)
+    rows, cols = gray.shape
+    if window > min(rows, cols):
+        raise ValueError(f'window of {window} pixels does not fit in a {rows} x {cols} image')
+    window_rows = np.arange(0, rows - window + 1, stride)
+    window_cols = np.arange(0, cols - window + 1, stride)
+    n_bins = levels * levels
+
+    # Per offset: pair codes, the window size in code coordinates, and the
+    # per-column histograms of the current row of windows
+    states = []
+    for angle in angles:
+        dr, dc = offset(distance, angle)
+        first, second = pair_views(gray, dr, dc)
+        codes = first.astype(np.int32) * levels + second
+        height, width = window - abs(dr), window - abs(dc)
+        columns = np.zeros((codes.shape[1], n_bins), dtype=np.int32)
+        states.append((codes, height, width, columns))
+
+    maps = {name: np.zeros((len(window_rows), len(window_cols))) for name in properties}
+    for w, top in enumerate(window_rows):
+        P = np.zeros((levels, levels, len(angles), len(window_cols)))
+        for a, (codes, height, width, columns) in enumerate(states):
+            flat_columns = columns.reshape(-1)
+            column_offsets = np.arange(codes.shape[1]) * n_bins
+            if w == 0:
+                entering, leaving = codes[:height], codes[:0]
+            else:
+                previous = window_rows[w - 1]
+                entering = codes[max(previous + height, top):top + height]
+                leaving = codes[previous:min(top, previous + height)]
+                if top >= previous + height:
+                    # Stride longer than the window: nothing carries over
+                    columns[:] = 0
+                    entering = codes[top:top + height]
+                    leaving = codes[:0]
+            np.add.at(flat_columns, (entering + column_offsets).ravel(), 1)
+            np.subtract.at(flat_columns, (leaving + column_offsets).ravel(), 1)
+
+            # Slide along the row of windows, again adding and removing only
+            # the columns that enter and leave
+            counts = np.empty((len(window_cols), n_bins), dtype=np.int64)
+            running = columns[:width].sum(axis=0, dtype=np.int64)
+            counts[0] = running
+            for j in range(1, len(window_cols)):
+                previous, left = window_cols[j - 1], window_cols[j]
+                if left >= previous + width:
+                    running = columns[left:left + width].sum(axis=0, dtype=np.int64)
+                else:
+                    running += columns[previous + width:left + width].sum(axis=0, dtype=np.int64)
+                    running -= columns[previous:left].sum(axis=0, dtype=np.int64)
+                counts[j] = running
+            P[:, :, a, :] = counts.T.reshape(levels, levels, -1)
+
+        P = P + P.transpose(1, 0, 2, 3)
+        P /= P.sum(axis=(0, 1), keepdims=True)
+        for name, value in glcm_properties(P, properties).items():
+            maps[name][w] = value.mean(axis=0)
+
+    return maps, window_rows + window / 2, window_cols + window / 2
@@ -0,0 +1,242 @@
+import collections
+import itertools
+
+import numpy as np
+import porespy as ps
+from edt import edt
+from porespy.tools import Results
+
+from sem_thickness import insert_spheres, reconstruct_radius
+
+
+# Split an N-d shape into cores of at most `tile` pixels per axis. Each core
+# is grown by `overlap` pixels on every side that has a neighbour, so a filter
+# run on the grown (outer) tile is exact inside the core as long as nothing
+# further than `overlap` away can influence it. Yields the outer slices, the
+# core slices (both in image coordinates) and the core slices relative to the
+# outer tile, in C order.
+def tile_slices(shape, tile, overlap):
+    ndim = len(shape)
+    tile = np.broadcast_to(tile, ndim)
+    overlap = np.broadcast_to(overlap, ndim)
+    starts = [range(0, size, int(step)) for size, step in zip(shape, tile)]
+
+    for corner in itertools.product(*starts):
+        outer, core, inner = [], [], []
+        for start, size, step, margin in zip(corner, shape, tile, overlap):
+            stop = min(start + int(step), size)
+            lo, hi = max(start - int(margin), 0), min(stop + int(margin), size)
+            outer.append(slice(lo, hi))
+            core.append(slice(start, stop))
+            inner.append(slice(start - lo, stop - lo))
+        yield tuple(outer), tuple(core), tuple(inner)
+
+
+# Minimal union-find over region labels, used to merge the labels that two
+# neighbouring tiles gave to the same pore
+class LabelUnion:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, label):
+        root = label
+        while self.parent.get(root, root) != root:
+            root = self.parent[root]
+        while label != root:
+            next_label = self.parent[label]
+            self.parent[label] = root
+            label = next_label
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+    # Lookup table mapping every label in 0..n_labels to a consecutive final
+    # label, counting only the labels in `used` (0 stays background)
+    def lookup(self, n_labels, used):
+        roots = np.arange(n_labels + 1, dtype=np.int64)
+        for label in list(self.parent):
+            roots[label] = self.find(label)
+        final = np.unique(np.append(roots[used], 0))
+        return np.searchsorted(final, roots)
+
+
+# Pair up labels of the new tile with the labels already written by earlier
+# tiles where the two overlap. A pair is merged when each is the other's
+# largest overlap, which keeps neighbouring pores that merely touch apart.
+def _match_overlap(new, old, union):
+    both = (new > 0) & (old > 0)
+    if not both.any():
+        return
+    pairs, counts = np.unique(np.stack([new[both], old[both]]).astype(np.int64), axis=1, return_counts=True)
+    order = np.argsort(-counts, kind='stable')
+    pairs = pairs[:, order]
+    _, best_new = np.unique(pairs[0], return_index=True)
+    _, best_old = np.unique(pairs[1], return_index=True)
+    for index in np.intersect1d(best_new, best_old):
+        union.union(int(pairs[0, index]), int(pairs[1, index]))
+
+
+# SNOW watershed partitioning of a large binary image, tile by tile. Each
+# outer tile is partitioned on its own, its core written into `out` with
+# labels offset past everything written so far, and labels that two tiles
+# gave to the same pore are merged through their overlap. `out` may be a
+# preallocated array or np.memmap, so only one outer tile of intermediate
+# data is held in memory at a time.
+def tiled_snow(im, tile=2048, overlap=64, out=None, r_max=4, sigma=0.4):
+    if out is None:
+        out = np.zeros(im.shape, dtype=np.int32)
+    union = LabelUnion()
+    n_labels = 0
+    used = []
+
+    for outer, core, inner in tile_slices(im.shape, tile, overlap):
+        labels = ps.filters.snow_partitioning(im=np.asarray(im[outer], dtype=bool), r_max=r_max,
+                                              sigma=sigma).regions.astype(np.int64)
+        labels[labels > 0] += n_labels
+        _match_overlap(labels, out[outer], union)
+        out[core] = labels[inner]
+        used.append(np.unique(out[core]))
+        n_labels = max(n_labels, int(labels.max()))
+
+    lut = union.lookup(n_labels, np.concatenate(used))
+    for _, core, _ in tile_slices(im.shape, tile, 0):
+        out[core] = lut[out[core]]
+
+    result = Results()
+    result.regions = out
+    return result
+
+
+# The part of the whole image's faces (porosimetry's default inlets) that
+# falls inside one tile
+def _face_inlets(outer, shape):
+    inlets = np.zeros([s.stop - s.start for s in outer], dtype=bool)
+    for axis, (s, size) in enumerate(zip(outer, shape)):
+        index = [slice(None)] * len(shape)
+        if s.start == 0:
+            index[axis] = 0
+            inlets[tuple(index)] = True
+        if s.stop == size:
+            index[axis] = -1
+            inlets[tuple(index)] = True
+    return inlets
+
+
+# For every tile of tile_slices(shape, tile, overlap), the tiles whose outer
+# tiles overlap its own, found from their positions on the tile grid
+def _tile_neighbours(shape, tile, overlap):
+    tile = np.broadcast_to(tile, len(shape)).astype(int)
+    overlap = np.broadcast_to(overlap, len(shape)).astype(int)
+    grid = tuple(-(-size // step) for size, step in zip(shape, tile))
+    reach = [max(1, int(np.ceil(2 * margin / step))) for step, margin in zip(tile, overlap)]
+    neighbours = []
+    for position in itertools.product(*[range(n) for n in grid]):
+        ranges = [range(max(p - r, 0), min(p + r + 1, n)) for p, r, n in zip(position, reach, grid)]
+        neighbours.append([int(np.ravel_multi_index(other, grid)) for other in itertools.product(*ranges)
+                           if other != position])
+    return neighbours
+
+
+# Integer distance map (inscribed radius, truncated as porosimetry does) of
+# a large binary image, tile by tile. Exact for every pixel whose nearest
+# solid pixel is at most `overlap` away, so for pores up to that radius.
+def tiled_radius(im, tile=2048, overlap=64, out=None):
+    if out is None:
+        out = np.zeros(im.shape, dtype=np.uint16)
+    limit = np.iinfo(out.dtype).max if np.issubdtype(out.dtype, np.integer) else np.inf
+    for outer, core, inner in tile_slices(im.shape, tile, overlap):
+        out[core] = np.minimum(edt(np.asarray(im[outer], dtype=bool))[inner], limit).astype(out.dtype)
+    return out
+
+
+# sem_thickness.access_radius of a large image from the faces of the whole
+# image. Accessibility is global (a pore in the middle of a mosaic is reached
+# through many tiles), so the reconstruction is propagated between tiles:
+# each outer tile is reconstructed from the access radii found so far, and
+# when that changes anything the tiles overlapping it are queued again,
+# until no tile changes. The result equals the whole-image reconstruction.
+def tiled_access_radius(radius, tile=2048, overlap=64, out=None):
+    if out is None:
+        out = np.zeros(radius.shape, dtype=radius.dtype)
+    overlap = np.maximum(overlap, 1)
+    tiles = [outer for outer, _, _ in tile_slices(radius.shape, tile, overlap)]
+    neighbours = _tile_neighbours(radius.shape, tile, overlap)
+
+    for _, core, _ in tile_slices(radius.shape, tile, 0):
+        out[core] = np.where(_face_inlets(core, radius.shape), radius[core], 0)
+    queue = collections.deque(i for i, outer in enumerate(tiles) if _face_inlets(outer, radius.shape).any())
+    queued = set(queue)
+    while queue:
+        i = queue.popleft()
+        queued.discard(i)
+        seed = np.asarray(out[tiles[i]])
+        if not seed.any():
+            continue
+        access = reconstruct_radius(seed, np.asarray(radius[tiles[i]]))
+        if np.array_equal(access, seed):
+            continue
+        out[tiles[i]] = access
+        for j in neighbours[i]:
+            if j not in queued:
+                queue.append(j)
+                queued.add(j)
+    return out
+
+
+# Porosimetry of a large binary image: the distance map and the access radii
+# from the whole image's faces are computed globally (tiled_radius,
+# tiled_access_radius), then spheres are inserted tile by tile
+# (sem_thickness.insert_spheres), keeping each core. The result equals
+# ps.filters.porosimetry of the whole image as long as `overlap` is at least
+# the largest pore radius. `work` may hold two preallocated integer arrays
+# (e.g. np.memmap) for the distance and access maps; sizes is passed to
+# insert_spheres.
+def tiled_porosimetry(im, tile=2048, overlap=64, out=None, work=None, sizes=None):
+    if out is None:
+        out = np.zeros(im.shape, dtype=np.float32)
+    if work is None:
+        work = np.zeros(im.shape, dtype=np.uint16), np.zeros(im.shape, dtype=np.uint16)
+    radius = tiled_radius(im, tile, overlap, work[0])
+    access = tiled_access_radius(radius, tile, overlap, work[1])
+    for outer, core, inner in tile_slices(im.shape, tile, overlap):
+        out[core] = insert_spheres(np.asarray(access[outer]), sizes)[inner] * np.asarray(im[core], dtype=bool)
+    return out
+
+
+# ps.metrics.pore_size_distribution computed in slabs along the first axis:
+# one pass for the value range, one to fill the histogram. Gives the same
+# bins and densities as the whole-array function without copying the image.
+def streamed_pore_size_distribution(im, bins=10, log=True, voxel_size=1, slab=256):
+    def values(chunk):
+        chunk = np.asarray(chunk)
+        vals = chunk[chunk > 0] * voxel_size
+        return np.log10(vals) if log else vals
+
+    if np.ndim(bins) == 0:
+        lo, hi = np.inf, -np.inf
+        for start in range(0, im.shape[0], slab):
+            vals = values(im[start:start + slab])
+            if vals.size:
+                lo, hi = min(lo, vals.min()), max(hi, vals.max())
+        edges = np.histogram_bin_edges([lo, hi], bins=bins)
+    else:
+        edges = np.asarray(bins, dtype=float)
+
+    counts = np.zeros(len(edges) - 1, dtype=np.int64)
+    for start in range(0, im.shape[0], slab):
+        counts += np.histogram(values(im[start:start + slab]), bins=edges)[0]
+
+    widths = np.diff(edges)
+    pdf = counts / (counts.sum() * widths)
+    psd = Results()
+    psd[f"{log * 'Log' + 'R'}"] = (edges[1:] + edges[:-1]) / 2
+    psd.pdf = pdf
+    psd.cdf = np.cumsum((pdf * widths)[::-1])[::-1]
+    psd.satn = pdf * widths
+    psd.bin_centers = (edges[1:] + edges[:-1]) / 2
+    psd.bin_edges = edges
+    psd.bin_widths = widths
+    return psd
@@ -0,0 +1,106 @@
+import os
+
+import pandas as pd
+
+# Columns of the watch-mode results table: one row per image and PSD bin
+RESULT_COLUMNS = ('image', 'mtime_ns', 'size_bytes', 'regions', 'log_radius', 'pdf', 'cdf')
+
+
+# (modification time in ns, size in bytes) of a file, or None if it is gone
+def file_state(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+# Rows of the results table for one processed image
+def result_rows(image, state, regions, psd):
+    return pd.DataFrame({'image': image, 'mtime_ns': state[0], 'size_bytes': state[1], 'regions': regions,
+                         'log_radius': psd.bin_centers, 'pdf': psd.pdf, 'cdf': psd.cdf},
+                        columns=list(RESULT_COLUMNS))
+
+
+# The results table, or an empty one before the first image is done
+def read_results(path):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=list(RESULT_COLUMNS))
+    return pd.read_csv(path)
+
+
+# Append rows to the CSV results table, writing the header for a new file
+def append_results(path, rows):
+    rows.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+
+# Only the rows of the most recent version of every image (an image that
+# was modified and processed again has rows for every version)
+def latest_results(table):
+    if table.empty:
+        return table
+    newest = table.groupby('image')['mtime_ns'].transform('max')
+    return table[table['mtime_ns'] == newest]
+
+
+class FolderWatcher:
+    """Finds images in a folder that are new or changed since they were processed.
+
+    An image is due when its (mtime, size) differs from the state it was
+    processed at, as recorded in the results table, and has not changed
+    since the previous poll, so files still being written by the microscope
+    software are left until they settle. Images handed out by poll() are
+    not handed out again until mark_processed() is called for them. Failed
+    images are marked too, and retried once their file changes again.
+    """
+
+    def __init__(self, directory, processed=None, extensions=('.tif', '.tiff', '.png', '.jpg', '.jpeg', '.bmp')):
+        self.directory = directory
+        self.extensions = extensions
+        self.processed = dict(processed or {})
+        self.pending = {}
+        self._seen = {}
+
+    @classmethod
+    def from_results(cls, directory, table, **kwargs):
+        latest = latest_results(table).drop_duplicates('image')
+        processed = {image: (int(mtime), int(size)) for image, mtime, size
+                     in zip(latest['image'], latest['mtime_ns'], latest['size_bytes'])}
+        return cls(directory, processed, **kwargs)
+
+    def poll(self):
+        due = []
+        seen = {}
+        for name in sorted(os.listdir(self.directory)):
+            if not name.lower().endswith(self.extensions) or name in self.pending:
+                continue
+            state = file_state(os.path.join(self.directory, name))
+            if state is None or state == self.processed.get(name):
+                continue
+            seen[name] = state
+            if self._seen.get(name) == state:
+                due.append(name)
+                self.pending[name] = state
+        self._seen = seen
+        return [(os.path.join(self.directory, name), self.pending[name]) for name in due]
+
+    def mark_processed(self, name):
+        self.processed[name] = self.pending.pop(name)
+
+
+# Cumulative pore size distributions of the latest version of every image in
+# the results table, radii converted from pixels to micrometers
+def plot_results_psd(table, pixels_per_micrometer, ax=None):
+    import matplotlib.pyplot as plt
+    if ax is None:
+        _, ax = plt.subplots(figsize=(8/2.54, 6/2.54))
+    for image, rows in latest_results(table).groupby('image', sort=True):
+        ax.plot(10 ** rows['log_radius'].to_numpy() / pixels_per_micrometer, rows['cdf'],
+                label=os.path.splitext(image)[0])
+    ax.set_xscale('log')
+    ax.set_xlabel('Pore Radius (μm)', fontsize=10)
+    ax.set_ylabel('Cumulative Distribution', fontsize=10)
+    if ax.lines:
+        ax.legend(fontsize=6)
+    ax.tick_params(axis='both', which='major', labelsize=8)
+    return ax
@@ -1,8 +1,11 @@
 import pandas as pd
 import numpy as np
-from lifelines import KaplanMeierFitter
-from lifelines.statistics import logrank_test
 import matplotlib.pyplot as plt
+from survival_counts import pairwise_logrank_table, pairwise_matrix, plot_pairwise_heatmap
+from survival_cube import SurvivalCube
+from survival_cache import FitCache
+from survival_bootstrap import bootstrap_survival_summary
+from survival_npmle import fit_npmle_counts, plot_npmle
 
 # Load the data
 data = {
@@ -104,55 +107,27 @@ data = {
     'group': ['Control'] * 12 + ['BNC'] * 12 + ['BPHB2%'] * 12 + ['BPHB5%'] * 12 + ['BPHB10%'] * 12 + ['PHB'] * 12 + ['EoC'] * 12 + ['EoD1'] * 12 + ['EoD2'] * 12
 }
 
-df = pd.DataFrame(data)
+# Define colors for each group
+colors = ['blue', 'red', 'green', 'orange', 'purple', 'pink', 'brown', 'gray', 'cyan']
 
-# Calculate the number of censored (survived) worms at each time point
-df['censored'] = df['total'] - df['dead']
 
-# Create a single figure with two subplots stacked vertically
-fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 16))
+# Pack the counts into a group x time x replicate cube; censored (survived)
+# worms are derived from it as total - dead
+def build_cube(data):
+    df = pd.DataFrame(data)
+    return SurvivalCube.from_frame(df, group_col='group', time_col='time', dead_col='dead', total_col='total')
 
-# Define colors for each group
-colors = ['blue', 'red', 'green', 'orange', 'purple', 'pink', 'brown', 'gray', 'cyan']
 
-# Perform Kaplan-Meier analysis and log-rank tests
-significant_groups = set()
-groups = df['group'].unique()
-control_group = 'Control'  # Set the control group
-for group in groups:
-    if group != control_group:
-        group_data = df[df['group'] == group]
-        control_data = df[df['group'] == control_group]
-        
-        T1 = np.repeat(group_data['time'].values, group_data['dead'].values)
-        E1 = np.ones_like(T1)
-        T2 = np.repeat(control_data['time'].values, control_data['dead'].values)
-        E2 = np.ones_like(T2)
-        
-        result = logrank_test(T1, T2, E1, E2)
-        if result.p_value < 0.05:
-            significant_groups.add(group)
-        print(f"Log-rank test {group} vs {control_group}: p-value = {result.p_value:.4f}")
-
-# Plot Kaplan-Meier curves
-for i, group in enumerate(groups):
-    group_data = df[df['group'] == group]
-    
-    kmf_data = []
-    kmf_observed = []
-    for _, row in group_data.iterrows():
-        kmf_data.extend([row['time']] * row['dead'] + [row['time']] * row['censored'])
-        kmf_observed.extend([1] * row['dead'] + [0] * row['censored'])
-
-    kmf = KaplanMeierFitter()
-    kmf.fit(kmf_data, event_observed=kmf_observed, label=group)
-    
-    # Plot on the first subplot (all curves)
-    kmf.plot(ax=ax1, ci_show=True, color=colors[i])
-    
-    # Plot on the second subplot (only significant curves and Control)
-    if group in significant_groups or group == control_group:
-        kmf.plot(ax=ax2, ci_show=True, color=colors[i])
+# All-pairs log-rank tests; a group is significant when its adjusted p-value
+# against the control group is below 0.05
+def logrank_analysis(cube, control_group='Control', p_adjust='p_bh', cache=None):
+    events, at_risk = cube.count_matrices()
+    pairwise = pairwise_logrank_table(cube.groups, events, at_risk, cache=cache)
+    adjusted = pairwise_matrix(pairwise, cube.groups, p_adjust)
+    significant_groups = {group for group in cube.groups
+                          if group != control_group and adjusted.loc[group, control_group] < 0.05}
+    return pairwise, significant_groups
+
 
 # Function to format y-axis as percentage
 def format_y_axis_as_percentage(ax):
@@ -160,26 +135,100 @@ def format_y_axis_as_percentage(ax):
     ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda y, _: '{:.0f}'.format(y*100)))
     ax.set_yticks([0, 0.25, 0.5, 0.75, 1])  # Set ticks at 0, 25, 50, 75, 100
 
-# Customize the first subplot (all curves)
-ax1.set_title('A', loc='left', pad=10)
-ax1.set_xlabel('Time (hours)')
-ax1.set_ylabel('Survival Probability (%)')
-ax1.grid(True)
-ax1.legend(title='All Groups', loc='center left', bbox_to_anchor=(1, 0.5))
-format_y_axis_as_percentage(ax1)
-
-# Customize the second subplot (significant curves)
-ax2.set_title('B', loc='left', pad=10)
-ax2.set_xlabel('Time (hours)')
-ax2.set_ylabel('Survival Probability (%)')
-ax2.grid(True)
-ax2.legend(title='Significant Groups', loc='center left', bbox_to_anchor=(1, 0.5))
-format_y_axis_as_percentage(ax2)
-
-# Add a main title to the figure
-fig.suptitle('', fontsize=16)
-
-# Adjust the layout and show the plot
-plt.tight_layout()
-plt.subplots_adjust(top=0.95, right=0.85, hspace=0.3)  # Make room for the main title, legends, and space between subplots
-plt.show()
+
+def plot_survival_figure(groups, fitters, significant_groups, control_group='Control', npmle=None):
+    # Create a single figure with two subplots stacked vertically
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 16))
+    group_colors = colors if len(groups) <= len(colors) else plt.cm.tab20(np.linspace(0, 1, len(groups)))
+
+    # Plot Kaplan-Meier curves
+    for i, group in enumerate(groups):
+        kmf = fitters[group]
+
+        # Plot on the first subplot (all curves)
+        kmf.plot(ax=ax1, ci_show=True, color=group_colors[i])
+        if npmle is not None:
+            plot_npmle(ax1, npmle, i, color=group_colors[i])
+
+        # Plot on the second subplot (only significant curves and Control)
+        if group in significant_groups or group == control_group:
+            kmf.plot(ax=ax2, ci_show=True, color=group_colors[i])
+            if npmle is not None:
+                plot_npmle(ax2, npmle, i, color=group_colors[i])
+
+    if npmle is not None:
+        for ax in (ax1, ax2):
+            ax.plot([], [], color='black', linestyle='--', label='Turnbull NPMLE')
+
+    # Customize the first subplot (all curves)
+    ax1.set_title('A', loc='left', pad=10)
+    ax1.set_xlabel('Time (hours)')
+    ax1.set_ylabel('Survival Probability (%)')
+    ax1.grid(True)
+    ax1.legend(title='All Groups', loc='center left', bbox_to_anchor=(1, 0.5))
+    format_y_axis_as_percentage(ax1)
+
+    # Customize the second subplot (significant curves)
+    ax2.set_title('B', loc='left', pad=10)
+    ax2.set_xlabel('Time (hours)')
+    ax2.set_ylabel('Survival Probability (%)')
+    ax2.grid(True)
+    ax2.legend(title='Significant Groups (adjusted p < 0.05)', loc='center left', bbox_to_anchor=(1, 0.5))
+    format_y_axis_as_percentage(ax2)
+
+    # Add a main title to the figure
+    fig.suptitle('', fontsize=16)
+
+    # Adjust the layout
+    fig.tight_layout()
+    fig.subplots_adjust(top=0.95, right=0.85, hspace=0.3)  # Make room for the main title, legends, and space between subplots
+    return fig
+
+
+def main():
+    cube = build_cube(data)
+
+    # Reuse fits and log-rank results from earlier runs for groups whose counts
+    # have not changed (set to None to always recompute)
+    cache = FitCache('.km_cache')
+
+    # Perform Kaplan-Meier analysis and log-rank tests
+    groups = cube.groups
+    control_group = 'Control'  # Set the control group
+    p_adjust = 'p_bh'  # 'p_holm' for family-wise control, 'p_bh' for false discovery rate
+    pairwise, significant_groups = logrank_analysis(cube, control_group, p_adjust, cache=cache)
+    raw = pairwise_matrix(pairwise, groups, 'p_value')
+    adjusted = pairwise_matrix(pairwise, groups, p_adjust)
+    for group in groups:
+        if group != control_group:
+            p_value = raw.loc[group, control_group]
+            p_adjusted = adjusted.loc[group, control_group]
+            print(f"Log-rank test {group} vs {control_group}: p-value = {p_value:.4f}, adjusted ({p_adjust}) = {p_adjusted:.4f}")
+
+    # Fit Kaplan-Meier curves directly from the (time, dead, censored) counts
+    fitters = cube.fit_km_all(cache=cache)
+
+    # Median survival and restricted mean survival time (up to the last
+    # timepoint) with 95% bootstrap confidence intervals
+    summary = bootstrap_survival_summary(cube.groups, cube.times, cube.dead_by_time, cube.censored_by_time, seed=0)
+    print("\nMedian survival and RMST (hours, 95% bootstrap CI):")
+    print(summary.to_string(index=False, float_format='{:.1f}'.format))
+
+    # Worms are only scored at the timepoints, so deaths are interval-censored;
+    # the Turnbull NPMLE is drawn as a dashed line next to each KM curve
+    show_npmle = True
+    npmle = fit_npmle_counts(cube.times, cube.dead_by_time, cube.censored_by_time) if show_npmle else None
+
+    plot_survival_figure(groups, fitters, significant_groups, control_group, npmle=npmle)
+
+    # Heatmap of the adjusted pairwise log-rank p-values
+    fig_pairs, ax_pairs = plt.subplots(figsize=(8, 7))
+    plot_pairwise_heatmap(pairwise, groups, column=p_adjust, ax=ax_pairs)
+    ax_pairs.set_title(f'Pairwise log-rank tests ({p_adjust})')
+    fig_pairs.tight_layout()
+
+    plt.show()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,69 +1,112 @@
+import argparse
 import pandas as pd
 import numpy as np
-from lifelines import KaplanMeierFitter
-from lifelines.statistics import logrank_test
 import matplotlib.pyplot as plt
+from survival_counts import count_matrices, fit_km_by_group, logrank_vs_control, read_survival_table
+from survival_cache import FitCache
+from survival_bootstrap import bootstrap_survival_summary
 
-# Read the CSV file
-df = pd.read_csv('c_elegans_data_template.csv', comment='#')
-
-# Create a single figure with two subplots stacked vertically
-fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 16))
-
-# Define colors for each group
-colors = plt.cm.tab10(np.linspace(0, 1, len(df['Group'].unique())))
-
-# Perform Kaplan-Meier analysis and log-rank tests
-significant_groups = set()
-groups = df['Group'].unique()
-control_group = 'Control'  # Assuming 'Control' is the reference group
-for group in groups:
-    if group != control_group:
-        group_data = df[df['Group'] == group]
-        control_data = df[df['Group'] == control_group]
-        
-        T1 = np.repeat(group_data['Time'].values, group_data['Dead'].values)
-        E1 = np.ones_like(T1)
-        T2 = np.repeat(control_data['Time'].values, control_data['Dead'].values)
-        E2 = np.ones_like(T2)
-        
-        result = logrank_test(T1, T2, E1, E2)
-        if result.p_value < 0.05:
-            significant_groups.add(group)
-        print(f"Log-rank test {group} vs {control_group}: p-value = {result.p_value:.4f}")
-
-# Plot Kaplan-Meier curves
-for i, group in enumerate(groups):
-    group_data = df[df['Group'] == group]
-    
-    kmf = KaplanMeierFitter()
-    kmf.fit(group_data['Time'], group_data['Dead'], label=group)
-    
-    # Plot on the first subplot (all curves)
-    kmf.plot(ax=ax1, ci_show=True, color=colors[i])
-    
-    # Plot on the second subplot (only significant curves and Control)
-    if group in significant_groups or group == control_group:
-        kmf.plot(ax=ax2, ci_show=True, color=colors[i])
-
-# Customize the first subplot (all curves)
-ax1.set_title('A', loc='left', pad=10)
-ax1.set_xlabel('Time (hours)')
-ax1.set_ylabel('Survival Probability')
-ax1.grid(True)
-ax1.legend(title='All Groups', loc='center left', bbox_to_anchor=(1, 0.5))
-
-# Customize the second subplot (significant curves)
-ax2.set_title('B', loc='left', pad=10)
-ax2.set_xlabel('Time (hours)')
-ax2.set_ylabel('Survival Probability')
-ax2.grid(True)
-ax2.legend(title='Sig* Groups (p < 0.05 vs Control)', loc='center left', bbox_to_anchor=(1, 0.5))
-
-# Add a main title to the figure
-fig.suptitle('Kaplan-Meier Survival Curves for C. elegans Groups', fontsize=16)
-
-# Adjust the layout and show the plot
-plt.tight_layout()
-plt.subplots_adjust(top=0.95, right=0.85, hspace=0.3)  # Make room for the main title, legends, and space between subplots
-plt.show()
+
+# Log-rank test of every group against the control group
+def logrank_table(df, control_group='Control', cache=None):
+    groups = df['Group'].unique()
+    _, _, events, at_risk = count_matrices(df, group_col='Group', time_col='Time', dead_col='Dead')
+    control_index = list(groups).index(control_group)
+    if cache is None:
+        statistic, p_values = logrank_vs_control(events, at_risk, control_index)
+    else:
+        statistic, p_values = cache.logrank_vs_control(events, at_risk, control_index)
+
+    results = pd.DataFrame({'group': list(groups), 'control': control_group,
+                            'statistic': statistic, 'p_value': p_values})
+    return results[results['group'] != control_group].reset_index(drop=True)
+
+
+# Median survival and restricted mean survival time (up to the last
+# timepoint) with 95% bootstrap confidence intervals
+def survival_summary(df, seed=0):
+    counts = df.pivot_table(index='Group', columns='Time', values=['Dead', 'Censored'],
+                            aggfunc='sum', fill_value=0, observed=True)
+    return bootstrap_survival_summary(counts.index, counts['Dead'].columns, counts['Dead'].to_numpy(),
+                                      counts['Censored'].to_numpy(), seed=seed)
+
+
+# Two-panel figure: A with all groups, B with the significant groups and Control
+def plot_survival_figure(groups, fitters, significant_groups, control_group='Control'):
+    # Create a single figure with two subplots stacked vertically
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 16))
+
+    # Define colors for each group
+    colors = plt.cm.tab10(np.linspace(0, 1, len(groups)))
+
+    # Plot Kaplan-Meier curves
+    for i, group in enumerate(groups):
+        kmf = fitters[group]
+
+        # Plot on the first subplot (all curves)
+        kmf.plot(ax=ax1, ci_show=True, color=colors[i])
+
+        # Plot on the second subplot (only significant curves and Control)
+        if group in significant_groups or group == control_group:
+            kmf.plot(ax=ax2, ci_show=True, color=colors[i])
+
+    # Customize the first subplot (all curves)
+    ax1.set_title('A', loc='left', pad=10)
+    ax1.set_xlabel('Time (hours)')
+    ax1.set_ylabel('Survival Probability')
+    ax1.grid(True)
+    ax1.legend(title='All Groups', loc='center left', bbox_to_anchor=(1, 0.5))
+
+    # Customize the second subplot (significant curves)
+    ax2.set_title('B', loc='left', pad=10)
+    ax2.set_xlabel('Time (hours)')
+    ax2.set_ylabel('Survival Probability')
+    ax2.grid(True)
+    ax2.legend(title=f'Sig* Groups (p < 0.05 vs {control_group})', loc='center left', bbox_to_anchor=(1, 0.5))
+
+    # Add a main title to the figure
+    fig.suptitle('Kaplan-Meier Survival Curves for C. elegans Groups', fontsize=16)
+
+    # Adjust the layout
+    fig.tight_layout()
+    fig.subplots_adjust(top=0.95, right=0.85, hspace=0.3)  # Make room for the main title, legends, and space between subplots
+    return fig
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kaplan-Meier curves and log-rank tests for C. elegans survival data.')
+    parser.add_argument('data', nargs='?', default='c_elegans_data_template.csv',
+                        help='Survival table in the Template.py layout: .csv, .feather or .parquet '
+                             '(default: c_elegans_data_template.csv)')
+    args = parser.parse_args()
+
+    # Read the data file (CSV in chunks, or a Parquet/Feather file from
+    # Template.py), aggregated to per-group, per-time counts
+    df = read_survival_table(args.data)
+
+    # Reuse fits and log-rank results from earlier runs for groups whose counts
+    # have not changed (set to None to always recompute)
+    cache = FitCache('.km_cache')
+
+    # Perform Kaplan-Meier analysis and log-rank tests
+    groups = df['Group'].unique()
+    control_group = 'Control'  # Assuming 'Control' is the reference group
+    results = logrank_table(df, control_group, cache=cache)
+    significant_groups = set(results.loc[results['p_value'] < 0.05, 'group'])
+    for group, p_value in zip(results['group'], results['p_value']):
+        print(f"Log-rank test {group} vs {control_group}: p-value = {p_value:.4f}")
+
+    # Fit Kaplan-Meier curves from the aggregated (Time, Dead, Censored) counts
+    fitters = fit_km_by_group(df, group_col='Group', time_col='Time', dead_col='Dead', censored_col='Censored',
+                              cache=cache)
+
+    summary = survival_summary(df)
+    print("\nMedian survival and RMST (hours, 95% bootstrap CI):")
+    print(summary.to_string(index=False, float_format='{:.1f}'.format))
+
+    plot_survival_figure(groups, fitters, significant_groups, control_group)
+    plt.show()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,43 +1,99 @@
-import csv
+import argparse
+import os
 
-# Define the structure of the CSV template
+import numpy as np
+import pandas as pd
+
+# Define the structure of the default CSV template
 groups = ['Control', 'Group1', 'Group2', 'Group3', 'Group4', 'Group5', 'Group6', 'Group7', 'Group8']
 time_points = [0, 24, 48, 72]
 replicates = 3
 
-# Create the CSV file
-with open('c_elegans_data_template.csv', 'w', newline='') as csvfile:
-    writer = csv.writer(csvfile)
-    
-    # Write instructions as comments
-    writer.writerow(['# Instructions:'])
-    writer.writerow(['# 1. Open this CSV file in a spreadsheet program.'])
-    writer.writerow(['# 2. For each group, time point, and replicate, fill in the "Dead" and "Total" columns.'])
-    writer.writerow(['# 3. "Dead" represents the number of dead worms at that time point.'])
-    writer.writerow(['# 4. "Total" represents the total number of worms at the start of the experiment for that replicate.'])
-    writer.writerow(['# 5. Save the file after entering all your data.'])
-    writer.writerow(['# 6. Use this filled CSV file as input for your Kaplan-Meier analysis script.'])
-    writer.writerow([])  # Add an empty row for separation
-    
-    # Write the header
-    header = ['Group', 'Time', 'Replicate', 'Dead', 'Total']
-    writer.writerow(header)
-    
-    # Write the data rows
-    for group in groups:
-        for time in time_points:
-            for replicate in range(1, replicates + 1):
-                row = [group, time, f'Rep{replicate}', '', '']
-                writer.writerow(row)
-
-print("CSV template 'c_elegans_data_template.csv' has been created.")
-print("The file includes instructions and is ready for data entry.")
-
-# Print the instructions to the console as well
-print("\nInstructions:")
-print("1. Open the 'c_elegans_data_template.csv' file in a spreadsheet program.")
-print("2. For each group, time point, and replicate, fill in the 'Dead' and 'Total' columns.")
-print("3. 'Dead' represents the number of dead worms at that time point.")
-print("4. 'Total' represents the total number of worms at the start of the experiment for that replicate.")
-print("5. Save the file after entering all your data.")
-print("6. Use this filled CSV file as input for your Kaplan-Meier analysis script.")
+instructions = [
+    'Instructions:',
+    '1. Open this CSV file in a spreadsheet program.',
+    '2. For each group, time point, and replicate, fill in the "Dead" and "Total" columns.',
+    '3. "Dead" represents the number of dead worms at that time point.',
+    '4. "Total" represents the total number of worms at the start of the experiment for that replicate.',
+    '5. Save the file after entering all your data.',
+    '6. Use this filled CSV file as input for your Kaplan-Meier analysis script.',
+]
+
+
+def _empty_counts(n_rows):
+    return pd.arrays.IntegerArray(np.zeros(n_rows, dtype=np.int32), np.ones(n_rows, dtype=bool))
+
+
+# Build the template for any group x time x replicate design as whole
+# columns at once, with compact dtypes: categorical Group/Replicate, int16
+# Time and nullable int32 Dead/Total (empty until filled in).
+def build_template(groups, time_points, replicates):
+    n_groups, n_times = len(groups), len(time_points)
+    n_rows = n_groups * n_times * replicates
+
+    group_codes = np.repeat(np.arange(n_groups, dtype=np.int32), n_times * replicates)
+    replicate_codes = np.tile(np.arange(replicates, dtype=np.int16), n_groups * n_times)
+    replicate_labels = [f'Rep{replicate}' for replicate in range(1, replicates + 1)]
+
+    return pd.DataFrame({
+        'Group': pd.Categorical.from_codes(group_codes, categories=list(groups)),
+        'Time': np.tile(np.repeat(np.asarray(time_points, dtype=np.int16), replicates), n_groups),
+        'Replicate': pd.Categorical.from_codes(replicate_codes, categories=replicate_labels),
+        'Dead': _empty_counts(n_rows),
+        'Total': _empty_counts(n_rows),
+    })
+
+
+# Write the template as CSV (with the instructions as '#' comment lines) or
+# as a columnar Parquet/Feather file, chosen by the file extension. Feather
+# is written uncompressed so the KM scripts can memory-map its columns.
+def write_template(df, path, chunksize=1_000_000):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        df.to_parquet(path, index=False)
+    elif extension in ('.feather', '.arrow'):
+        df.to_feather(path, compression='uncompressed')
+    else:
+        with open(path, 'w', newline='') as f:
+            for line in instructions:
+                f.write(f'# {line}\n')
+            f.write('\n')  # Add an empty row for separation
+            df.to_csv(f, index=False, chunksize=chunksize)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create a data-entry template for the Kaplan-Meier scripts.')
+    parser.add_argument('--groups', type=int, default=None,
+                        help='Number of groups (Control plus Group1..GroupN-1); default is the 9-group layout')
+    parser.add_argument('--group-names', nargs='+', default=None, help='Explicit group names')
+    parser.add_argument('--time-points', type=int, nargs='+', default=time_points)
+    parser.add_argument('--replicates', type=int, default=replicates)
+    parser.add_argument('--output', default='c_elegans_data_template.csv',
+                        help='Output file; .parquet or .feather for a columnar file')
+    args = parser.parse_args()
+
+    if args.group_names:
+        template_groups = args.group_names
+    elif args.groups:
+        template_groups = ['Control'] + [f'Group{i}' for i in range(1, args.groups)]
+    else:
+        template_groups = groups
+
+    df = build_template(template_groups, args.time_points, args.replicates)
+    write_template(df, args.output)
+
+    print(f"Template '{args.output}' has been created ({len(df)} rows).")
+    print("The file includes instructions and is ready for data entry.")
+
+    # Print the instructions to the console as well
+    print("\nInstructions:")
+    print(f"1. Open the '{args.output}' file in a spreadsheet program.")
+    print("2. For each group, time point, and replicate, fill in the 'Dead' and 'Total' columns.")
+    print("3. 'Dead' represents the number of dead worms at that time point.")
+    print("4. 'Total' represents the total number of worms at the start of the experiment for that replicate.")
+    print("5. Save the file after entering all your data.")
+    print("6. Use this filled CSV file as input for your Kaplan-Meier analysis script.")
+
+
+if __name__ == '__main__':
+    main()
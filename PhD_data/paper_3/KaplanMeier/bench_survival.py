@@ -0,0 +1,166 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+import C_elegans_KaplanMeier_Curves as curves
+import KaplanMeier_script as script
+from survival_counts import fit_km_by_group, read_survival_csv
+from survival_cube import SurvivalCube
+from Template import build_template
+
+
+# Synthetic screen in the Template.py layout (Group, Time, Replicate, Dead,
+# Total). Each group gets its own constant hazard and Dead is the cumulative
+# number of dead worms at each timepoint, as entered by hand in the template.
+def synthetic_survival_frame(n_groups, n_timepoints, n_replicates, worms_per_replicate,
+                             time_step=24, seed=0):
+    rng = np.random.default_rng(seed)
+    groups = ['Control'] + [f'Group{i}' for i in range(1, n_groups)]
+    times = np.arange(n_timepoints) * time_step
+    hazards = rng.uniform(0.002, 0.03, size=n_groups)
+
+    # Survival to each timepoint, then cumulative deaths per replicate
+    death_prob = 1 - np.exp(-hazards[:, None, None] * times[None, :, None])
+    death_prob = np.broadcast_to(death_prob, (n_groups, n_timepoints, n_replicates))
+    dead = rng.binomial(worms_per_replicate, death_prob)
+    dead = np.maximum.accumulate(dead, axis=1)
+
+    df = build_template(groups, times, n_replicates)
+    df['Dead'] = dead.ravel().astype(np.int32)
+    df['Total'] = np.int32(worms_per_replicate)
+    return df
+
+
+def write_synthetic_csv(path, *args, **kwargs):
+    synthetic_survival_frame(*args, **kwargs).to_csv(path, index=False)
+    return path
+
+
+# Run fn once for wall and CPU time, then (with track_memory) a second time
+# under tracemalloc for the peak bytes allocated on top of what was already
+# live. Timing is taken without tracemalloc, which slows allocation-heavy
+# Python code considerably.
+def measure(fn, *args, track_memory=True, **kwargs):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    result = fn(*args, **kwargs)
+    stats = {'wall_s': time.perf_counter() - wall, 'cpu_s': time.process_time() - cpu, 'peak_bytes': None}
+
+    if track_memory:
+        tracemalloc.start()
+        fn(*args, **kwargs)
+        stats['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, stats
+
+
+def _render(fig_fn, *args, **kwargs):
+    fig = fig_fn(*args, **kwargs)
+    fig.canvas.draw()
+    plt.close(fig)
+
+
+# Time ingestion, KM fitting, log-rank and rendering separately for both
+# script paths on one synthetic design.
+def bench_case(n_groups, n_timepoints, n_replicates, worms_per_replicate, workdir, render=True,
+               track_memory=True, seed=0):
+    case = {'groups': n_groups, 'timepoints': n_timepoints, 'replicates': n_replicates,
+            'worms_per_replicate': worms_per_replicate}
+    path = os.path.join(workdir, f'bench_{n_groups}_{n_timepoints}_{n_replicates}_{worms_per_replicate}.csv')
+    write_synthetic_csv(path, n_groups, n_timepoints, n_replicates, worms_per_replicate, seed=seed)
+    case['csv_bytes'] = os.path.getsize(path)
+    records = []
+
+    def record(pipeline, stage, stats):
+        records.append({**case, 'pipeline': pipeline, 'stage': stage, **stats})
+
+    # KaplanMeier_script.py: streamed CSV -> aggregated counts
+    df, stats = measure(read_survival_csv, path, track_memory=track_memory)
+    record('KaplanMeier_script', 'ingest', stats)
+    fitters, stats = measure(fit_km_by_group, df, group_col='Group', time_col='Time', dead_col='Dead',
+                             censored_col='Censored', track_memory=track_memory)
+    record('KaplanMeier_script', 'km_fit', stats)
+    results, stats = measure(script.logrank_table, df, track_memory=track_memory)
+    record('KaplanMeier_script', 'logrank', stats)
+    if render:
+        significant = set(results.loc[results['p_value'] < 0.05, 'group'])
+        _, stats = measure(_render, script.plot_survival_figure, df['Group'].unique(), fitters, significant,
+                           track_memory=track_memory)
+        record('KaplanMeier_script', 'render', stats)
+
+    # C_elegans_KaplanMeier_Curves.py: long table -> SurvivalCube
+    def load_cube():
+        long = pd.read_csv(path)
+        return SurvivalCube.from_frame(long, group_col='Group', time_col='Time', dead_col='Dead',
+                                       total_col='Total', replicate_col='Replicate')
+
+    cube, stats = measure(load_cube, track_memory=track_memory)
+    record('C_elegans_KaplanMeier_Curves', 'ingest', stats)
+    fitters, stats = measure(cube.fit_km_all, track_memory=track_memory)
+    record('C_elegans_KaplanMeier_Curves', 'km_fit', stats)
+    (_, significant), stats = measure(curves.logrank_analysis, cube, track_memory=track_memory)
+    record('C_elegans_KaplanMeier_Curves', 'logrank', stats)
+    if render:
+        _, stats = measure(_render, curves.plot_survival_figure, cube.groups, fitters, significant,
+                           track_memory=track_memory)
+        record('C_elegans_KaplanMeier_Curves', 'render', stats)
+
+    os.remove(path)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scaling benchmark for the Kaplan-Meier survival pipeline.')
+    parser.add_argument('--groups', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--timepoints', type=int, nargs='+', default=[4])
+    parser.add_argument('--replicates', type=int, nargs='+', default=[3])
+    parser.add_argument('--worms', type=int, nargs='+', default=[50], help='Worms per replicate')
+    parser.add_argument('--no-render', action='store_true', help='Skip the figure rendering stage')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc peak-memory runs')
+    parser.add_argument('--output', default=None, help='Write JSON results here instead of stdout')
+    args = parser.parse_args()
+
+    # Crowded legends on large screens make tight_layout warn on every figure
+    warnings.filterwarnings('ignore', message='Tight layout not applied')
+
+    records = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for design in itertools.product(args.groups, args.timepoints, args.replicates, args.worms):
+            records.extend(bench_case(*design, workdir=workdir, render=not args.no_render,
+                                      track_memory=not args.no_memory))
+            print(f"done: groups={design[0]} timepoints={design[1]} replicates={design[2]} worms={design[3]}",
+                  file=sys.stderr)
+
+    report = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024),
+        'results': records,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
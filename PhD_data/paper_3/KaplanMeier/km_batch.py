@@ -0,0 +1,91 @@
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')  # Headless: workers never need a display
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from KaplanMeier_script import logrank_table, plot_survival_figure
+from survival_cache import FitCache
+from survival_counts import fit_km_by_group, read_survival_table
+
+
+# Analyse one survival file and write its two-panel figure in every requested
+# format. Returns the experiment's log-rank table for the batch summary.
+def render_experiment(path, output_dir, formats=('png', 'pdf'), control_group='Control',
+                      alpha=0.05, dpi=300, cache_dir=None):
+    name = os.path.splitext(os.path.basename(path))[0]
+    cache = FitCache(cache_dir) if cache_dir else None
+
+    df = read_survival_table(path)
+    groups = df['Group'].unique()
+    results = logrank_table(df, control_group, cache=cache)
+    significant_groups = set(results.loc[results['p_value'] < alpha, 'group'])
+    fitters = fit_km_by_group(df, group_col='Group', time_col='Time', dead_col='Dead', censored_col='Censored',
+                              cache=cache)
+
+    fig = plot_survival_figure(groups, fitters, significant_groups, control_group)
+    fig.suptitle(name, fontsize=16)
+    for fmt in formats:
+        fig.savefig(os.path.join(output_dir, f'{name}.{fmt}'), dpi=dpi, format=fmt)
+    plt.close(fig)
+
+    results.insert(0, 'experiment', name)
+    results['significant'] = results['p_value'] < alpha
+    return results
+
+
+# Render every survival file matching pattern in input_dir on a process
+# pool. A failing experiment is reported and skipped rather than stopping
+# the batch.
+def render_directory(input_dir, output_dir, pattern='*.csv', n_workers=None, formats=('png', 'pdf'),
+                     control_group='Control', alpha=0.05, dpi=300, cache_dir=None):
+    os.makedirs(output_dir, exist_ok=True)
+    paths = sorted(glob.glob(os.path.join(input_dir, pattern)))
+
+    tables = []
+    failures = []
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = {pool.submit(render_experiment, path, output_dir, formats, control_group, alpha, dpi,
+                               cache_dir): path for path in paths}
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                tables.append(future.result())
+                print(f"[{done}/{len(paths)}] {os.path.basename(path)}")
+            except Exception as error:
+                failures.append((path, error))
+                print(f"[{done}/{len(paths)}] {os.path.basename(path)} failed: {error}")
+
+    columns = ['experiment', 'group', 'control', 'statistic', 'p_value', 'significant']
+    summary = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=columns)
+    summary = summary.sort_values(['experiment', 'group'], ignore_index=True)
+    summary.to_csv(os.path.join(output_dir, 'logrank_summary.csv'), index=False)
+    return summary, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render Kaplan-Meier figures for a directory of survival CSVs.')
+    parser.add_argument('input_dir', help='Directory with survival CSVs in the Template.py layout')
+    parser.add_argument('output_dir', help='Directory for figures and logrank_summary.csv')
+    parser.add_argument('--pattern', default='*.csv', help='Glob for the input files, e.g. *.feather (default: *.csv)')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: all cores)')
+    parser.add_argument('--formats', nargs='+', default=['png', 'pdf'], help='Figure formats (default: png pdf)')
+    parser.add_argument('--control', default='Control', help='Reference group for the log-rank tests')
+    parser.add_argument('--alpha', type=float, default=0.05, help='Significance level for panel B')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--cache-dir', default=None, help='Reuse KM fits from this FitCache directory')
+    args = parser.parse_args()
+
+    summary, failures = render_directory(args.input_dir, args.output_dir, args.pattern, args.workers,
+                                         tuple(args.formats), args.control, args.alpha, args.dpi, args.cache_dir)
+    print(f"\n{summary['experiment'].nunique()} experiments rendered, {len(failures)} failed")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+# Kaplan-Meier survival at each timepoint from (..., time) count arrays,
+# batched over any leading axes (groups, resamples). Worms censored at a
+# timepoint are still at risk at that timepoint, as in lifelines.
+def km_survival(dead, censored):
+    dead = np.asarray(dead, dtype=float)
+    leaving = dead + censored
+    at_risk = np.cumsum(leaving[..., ::-1], axis=-1)[..., ::-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hazard = np.where(at_risk > 0, dead / at_risk, 0.0)
+    return np.cumprod(1.0 - hazard, axis=-1)
+
+
+# First time the survival curve drops to 0.5 or below; inf when it never does
+def median_survival(times, survival):
+    below = survival <= 0.5
+    first = np.argmax(below, axis=-1)
+    return np.where(below.any(axis=-1), np.asarray(times, dtype=float)[first], np.inf)
+
+
+# Area under the step survival curve from 0 to tau. Survival is 1 before the
+# first timepoint and stays at S(t_k) until the next one.
+def restricted_mean_survival(times, survival, tau):
+    times = np.clip(np.asarray(times, dtype=float), 0, tau)
+    widths = np.diff(np.append(times, tau))
+    return times[0] + (survival * widths).sum(axis=-1)
+
+
+def _bootstrap_batch(seed, size, n_worms, pvals, times, tau):
+    n_times = len(times)
+    draws = np.random.default_rng(seed).multinomial(n_worms, pvals, size=(size, len(n_worms)))
+    survival = km_survival(draws[..., :n_times], draws[..., n_times:])
+    return median_survival(times, survival), restricted_mean_survival(times, survival, tau)
+
+
+# Median survival and RMST (up to tau, by default the last timepoint) per
+# group with percentile bootstrap CIs. Each resample redistributes a group's
+# worms over its (time, dead/censored) cells with one multinomial draw, and
+# the KM curves of all groups in a batch of resamples are computed together,
+# so no fitter is ever refitted. Batches are sized to stay under
+# max_batch_bytes, get their own child seed (results do not depend on
+# n_workers) and run on a thread pool, as NumPy draws without the GIL.
+def bootstrap_survival_summary(groups, times, dead, censored, tau=None, n_resamples=10_000,
+                               alpha=0.05, seed=None, n_workers=None, max_batch_bytes=64 * 1024 ** 2):
+    times = np.asarray(times)
+    dead = np.asarray(dead, dtype=np.int64)
+    censored = np.clip(np.asarray(censored, dtype=np.int64), 0, None)
+    tau = times.max() if tau is None else tau
+    n_groups, n_times = dead.shape
+
+    cells = np.concatenate([dead, censored], axis=1)
+    n_worms = cells.sum(axis=1)
+    pvals = cells / np.maximum(n_worms, 1)[:, None]
+
+    survival = km_survival(dead, censored)
+    medians = median_survival(times, survival)
+    rmst = restricted_mean_survival(times, survival, tau)
+
+    batch = max(1, int(max_batch_bytes // (n_groups * 2 * n_times * 8 * 4)))
+    starts = range(0, n_resamples, batch)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        results = list(pool.map(
+            lambda job: _bootstrap_batch(job[1], min(batch, n_resamples - job[0]), n_worms, pvals, times, tau),
+            zip(starts, seeds)))
+    boot_medians = np.concatenate([result[0] for result in results])
+    boot_rmst = np.concatenate([result[1] for result in results])
+
+    # Medians take a few discrete values (and inf), so use observed values
+    # rather than interpolating between them
+    quantiles = [alpha / 2, 1 - alpha / 2]
+    median_ci = np.quantile(boot_medians, quantiles, axis=0, method='nearest')
+    rmst_ci = np.quantile(boot_rmst, quantiles, axis=0)
+
+    return pd.DataFrame({
+        'group': list(groups),
+        'n': n_worms,
+        'median': medians,
+        'median_lower': median_ci[0],
+        'median_upper': median_ci[1],
+        'rmst': rmst,
+        'rmst_lower': rmst_ci[0],
+        'rmst_upper': rmst_ci[1],
+        'tau': tau,
+    })
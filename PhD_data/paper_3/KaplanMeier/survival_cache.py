@@ -0,0 +1,170 @@
+import hashlib
+import os
+import pickle
+
+import lifelines
+import numpy as np
+from scipy.stats import chi2
+
+from survival_counts import fit_km_weighted, logrank_pairwise, logrank_statistic
+
+# Bump when the layout of cached objects changes so old entries are ignored
+CACHE_VERSION = 1
+
+
+class FitCache:
+    """On-disk cache of Kaplan-Meier fits and log-rank results.
+
+    Entries are pickles named by a hash of the group's count data and the fit
+    parameters, so a rerun only recomputes groups whose counts changed. The
+    directory is kept under `max_bytes` by evicting the least recently used
+    entries (reads refresh an entry's modification time).
+    """
+
+    def __init__(self, directory='.km_cache', max_bytes=256 * 1024 ** 2):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        digest = hashlib.sha1(f'v{CACHE_VERSION}|lifelines {lifelines.__version__}'.encode())
+        for part in parts:
+            if isinstance(part, np.ndarray):
+                part = np.ascontiguousarray(part)
+                digest.update(f'{part.dtype.str}{part.shape}'.encode())
+                digest.update(part.tobytes())
+            else:
+                digest.update(repr(part).encode())
+            digest.update(b'|')
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+        self._size = self.size() if self._size is None else self._size + os.path.getsize(path) - previous
+        if self._size > self.max_bytes:
+            self.evict()
+
+    # (mtime, size, path) of every entry. Other processes sharing the
+    # directory may remove entries while it is being scanned.
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._size = total
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                os.remove(entry.path)
+        self._size = 0
+
+    def fit_km_weighted(self, durations, events, weights, label=None, alpha=None):
+        key = self.key('km', durations, events, weights, label, alpha)
+        kmf = self.get(key)
+        if kmf is None:
+            kmf = fit_km_weighted(durations, events, weights, label=label, alpha=alpha)
+            self.put(key, kmf)
+        return kmf
+
+    def _group_keys(self, events, at_risk):
+        return [self.key('counts', events[i], at_risk[i]) for i in range(len(events))]
+
+    # Group-vs-control log-rank results, keyed by the group's and the
+    # control's counts; only groups without a cached result are computed.
+    def logrank_vs_control(self, events, at_risk, control_index):
+        keys = self._group_keys(events, at_risk)
+        control_key = keys[control_index]
+
+        statistic = np.full(len(events), np.nan)
+        for i, key in enumerate(keys):
+            if i != control_index:
+                cached = self.get(self.key('logrank', key, control_key))
+                if cached is not None:
+                    statistic[i] = cached
+
+        missing = np.flatnonzero(np.isnan(statistic))
+        missing = missing[missing != control_index]
+        if len(missing):
+            statistic[missing] = logrank_statistic(events[missing], at_risk[missing],
+                                                   events[control_index], at_risk[control_index])
+            for i in missing:
+                self.put(self.key('logrank', keys[i], control_key), float(statistic[i]))
+
+        return statistic, chi2.sf(statistic, 1)
+
+    # All-pairs log-rank statistics. Each group's cache entry maps the other
+    # groups' count keys to the pair statistic. Only groups without a cached
+    # row are stale, and only their pairs are computed. The statistic is
+    # symmetric, so a stale group's new row also supplies its column in the
+    # rows already cached, which are read but not rewritten. Changing one
+    # group therefore only recomputes and stores that group's row.
+    def logrank_pairwise(self, events, at_risk, n_workers=None):
+        n_groups = len(events)
+        keys = self._group_keys(events, at_risk)
+        rows = [self.get(self.key('logrank-row', key)) for key in keys]
+
+        if all(row is None for row in rows):
+            statistic, _ = logrank_pairwise(events, at_risk, n_workers=n_workers)
+        else:
+            statistic = np.array([[np.nan if row is None else row.get(other, np.nan) for other in keys]
+                                  for row in rows]).reshape(n_groups, n_groups)
+            statistic = np.where(np.isnan(statistic), statistic.T, statistic)
+            np.fill_diagonal(statistic, 0.0)
+            i, j = np.nonzero(np.triu(np.isnan(statistic)))
+            if len(i):
+                statistic[i, j] = logrank_statistic(events[i], at_risk[i], events[j], at_risk[j])
+                statistic[j, i] = statistic[i, j]
+        np.fill_diagonal(statistic, np.nan)
+
+        for i, row in enumerate(rows):
+            if row is None:
+                row = {keys[j]: float(statistic[i, j]) for j in range(n_groups) if j != i}
+                self.put(self.key('logrank-row', keys[i]), row)
+
+        return statistic, chi2.sf(statistic, 1)
@@ -0,0 +1,272 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from lifelines import KaplanMeierFitter
+from scipy.stats import chi2
+
+
+# Turn an aggregated (time, dead, censored) count table into the duration /
+# event / weight arrays lifelines accepts, one entry per non-empty cell
+# instead of one entry per worm.
+def counts_to_weights(times, dead, censored):
+    times = np.asarray(times)
+    dead = np.asarray(dead)
+    censored = np.asarray(censored)
+
+    durations = np.concatenate([times, times])
+    events = np.concatenate([np.ones(len(times), dtype=int), np.zeros(len(times), dtype=int)])
+    weights = np.concatenate([dead, censored])
+
+    keep = weights > 0
+    return durations[keep], events[keep], weights[keep]
+
+
+def fit_km_weighted(durations, events, weights, label=None, alpha=None):
+    kmf = KaplanMeierFitter(alpha=0.05 if alpha is None else alpha)
+    kmf.fit(durations, event_observed=events, weights=weights, label=label)
+    return kmf
+
+
+# With a survival_cache.FitCache the fit is looked up by a hash of the counts
+# and only refitted when they changed.
+def fit_km_counts(times, dead, censored, label=None, alpha=None, cache=None):
+    durations, events, weights = counts_to_weights(times, dead, censored)
+    fit = fit_km_weighted if cache is None else cache.fit_km_weighted
+    return fit(durations, events, weights, label=label, alpha=alpha)
+
+
+# Fit one KaplanMeierFitter per group from a long count table. The weight
+# arrays are built once for the whole table and then split per group, so
+# no per-worm lists are ever created.
+def fit_km_by_group(df, group_col='group', time_col='time', dead_col='dead',
+                    censored_col='censored', alpha=None, cache=None):
+    groups = df[group_col].unique()
+    codes = pd.Categorical(df[group_col], categories=groups).codes
+
+    durations, events, weights = counts_to_weights(df[time_col], df[dead_col], df[censored_col])
+    cells = np.concatenate([df[dead_col], df[censored_col]])
+    group_codes = np.concatenate([codes, codes])[cells > 0]
+
+    order = np.argsort(group_codes, kind='stable')
+    bounds = np.searchsorted(group_codes[order], np.arange(len(groups) + 1))
+
+    fit = fit_km_weighted if cache is None else cache.fit_km_weighted
+    fitters = {}
+    for i, group in enumerate(groups):
+        idx = order[bounds[i]:bounds[i + 1]]
+        fitters[group] = fit(durations[idx], events[idx], weights[idx], label=group, alpha=alpha)
+    return fitters
+
+
+# Compact dtypes for the Template.py column layout
+SURVIVAL_CSV_DTYPES = {'Group': 'category', 'Time': 'int16', 'Dead': 'int32', 'Total': 'int32'}
+
+
+# Stream a survival CSV in chunks and aggregate it straight into per-group,
+# per-time Dead/Total/Censored counts (summed over replicates), so only one
+# chunk and the running totals are ever held in memory. Groups keep their
+# order of first appearance in the file.
+def read_survival_csv(path, chunksize=1_000_000, dtypes=None):
+    dtypes = SURVIVAL_CSV_DTYPES if dtypes is None else dtypes
+    reader = pd.read_csv(path, comment='#', usecols=list(dtypes), dtype=dtypes, chunksize=chunksize)
+
+    totals = None
+    group_order = []
+    seen = set()
+    for chunk in reader:
+        for group in chunk['Group'].unique():
+            if group not in seen:
+                seen.add(group)
+                group_order.append(group)
+        part = chunk.groupby(['Group', 'Time'], observed=True)[['Dead', 'Total']].sum()
+        totals = part if totals is None else totals.add(part, fill_value=0)
+
+    if totals is None:
+        return pd.DataFrame(columns=['Group', 'Time', 'Dead', 'Total', 'Censored'])
+
+    totals = totals.astype('int64').reset_index()
+    totals['Group'] = pd.Categorical(totals['Group'].astype(str), categories=[str(g) for g in group_order])
+    totals = totals.sort_values(['Group', 'Time'], ignore_index=True)
+    totals['Censored'] = totals['Total'] - totals['Dead']
+    return totals
+
+
+# Aggregate a columnar (Parquet or Feather) survival file written by
+# Template.py without parsing any text. Feather files are memory-mapped, so
+# the Group/Time/Dead/Total columns are read in place; only those four
+# columns are ever loaded.
+def read_survival_columnar(path):
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+    import pyarrow.parquet as parquet
+
+    columns = ['Group', 'Time', 'Dead', 'Total']
+    if path.lower().endswith('.parquet'):
+        table = parquet.read_table(path, columns=columns, memory_map=True)
+    else:
+        table = feather.read_table(path, columns=columns, memory_map=True)
+
+    group_order = [str(group) for group in pc.unique(table['Group'].cast('string')).to_pylist()]
+    totals = table.group_by(['Group', 'Time']).aggregate([('Dead', 'sum'), ('Total', 'sum')]).to_pandas()
+    totals = totals.rename(columns={'Dead_sum': 'Dead', 'Total_sum': 'Total'})
+
+    totals['Group'] = pd.Categorical(totals['Group'].astype(str), categories=group_order)
+    totals[['Dead', 'Total']] = totals[['Dead', 'Total']].fillna(0).astype('int64')
+    totals = totals.sort_values(['Group', 'Time'], ignore_index=True)[['Group', 'Time', 'Dead', 'Total']]
+    totals['Censored'] = totals['Total'] - totals['Dead']
+    return totals
+
+
+# Per-group, per-time counts from any survival file the scripts accept:
+# Parquet/Feather through Arrow, anything else as a streamed CSV.
+def read_survival_table(path, chunksize=1_000_000):
+    if path.lower().endswith(('.parquet', '.feather', '.arrow')):
+        return read_survival_columnar(path)
+    return read_survival_csv(path, chunksize=chunksize)
+
+
+# Collapse a long count table into group x timepoint matrices of events and
+# numbers at risk. Groups keep their order of first appearance and times are
+# sorted. Without a censored column every worm leaves the risk set at its
+# event time, which is how the scripts' log-rank tests treat the data.
+def count_matrices(df, group_col='group', time_col='time', dead_col='dead', censored_col=None):
+    groups = df[group_col].unique()
+    times = np.sort(df[time_col].unique())
+    g = pd.Categorical(df[group_col], categories=groups).codes
+    t = np.searchsorted(times, df[time_col].to_numpy())
+
+    events = np.zeros((len(groups), len(times)))
+    np.add.at(events, (g, t), df[dead_col].to_numpy())
+    leaving = events.copy()
+    if censored_col is not None:
+        np.add.at(leaving, (g, t), df[censored_col].to_numpy())
+
+    # Everyone who leaves at or after a timepoint is at risk at that timepoint
+    at_risk = np.cumsum(leaving[:, ::-1], axis=1)[:, ::-1]
+    return groups, times, events, at_risk
+
+
+# Two-sample log-rank statistic, broadcast over every axis but the last
+# (timepoints).
+def logrank_statistic(d1, n1, d2, n2):
+    d = d1 + d2
+    n = n1 + n2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = np.where(n > 0, d * n1 / n, 0.0)
+        variance = np.where(n > 1, d * (n1 / n) * (n2 / n) * (n - d) / (n - 1), 0.0)
+        observed_minus_expected = (d1 - expected).sum(axis=-1)
+        return observed_minus_expected ** 2 / variance.sum(axis=-1)
+
+
+# Two-sample log-rank test of every group against one control row, computed
+# for all groups at once by broadcasting over the count matrices.
+def logrank_vs_control(events, at_risk, control_index):
+    statistic = logrank_statistic(events, at_risk, events[control_index], at_risk[control_index])
+    p_values = chi2.sf(statistic, 1)
+    statistic[control_index] = np.nan
+    p_values[control_index] = np.nan
+    return statistic, p_values
+
+
+def _logrank_rows(events, at_risk, start, stop):
+    return logrank_statistic(events[start:stop, None, :], at_risk[start:stop, None, :],
+                              events[None, :, :], at_risk[None, :, :])
+
+
+# Log-rank statistics and p-values for every pair of groups (G x G). Blocks
+# of rows are handed to a process pool once the screen is large enough for
+# that to pay off; small tables are computed in-process.
+def logrank_pairwise(events, at_risk, n_workers=None, rows_per_task=32, min_groups_for_pool=64):
+    n_groups = len(events)
+    blocks = [(start, min(start + rows_per_task, n_groups)) for start in range(0, n_groups, rows_per_task)]
+
+    if n_workers == 1 or n_groups < min_groups_for_pool:
+        parts = [_logrank_rows(events, at_risk, start, stop) for start, stop in blocks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_logrank_rows, events, at_risk, start, stop) for start, stop in blocks]
+            parts = [future.result() for future in futures]
+
+    statistic = np.concatenate(parts, axis=0)
+    np.fill_diagonal(statistic, np.nan)
+    return statistic, chi2.sf(statistic, 1)
+
+
+# Holm (family-wise) and Benjamini-Hochberg (false discovery rate) adjusted
+# p-values. NaNs are left in place and not counted as tests.
+def adjust_p_values(p_values, method='holm'):
+    p_values = np.asarray(p_values, dtype=float)
+    adjusted = np.full_like(p_values, np.nan)
+    valid = ~np.isnan(p_values)
+    p = p_values[valid]
+    m = len(p)
+    if m == 0:
+        return adjusted
+
+    order = np.argsort(p)
+    ranked = p[order]
+    if method == 'holm':
+        ranked = np.maximum.accumulate(np.minimum((m - np.arange(m)) * ranked, 1.0))
+    elif method == 'bh':
+        ranked = np.minimum.accumulate((m / np.arange(1, m + 1) * ranked)[::-1])[::-1]
+        ranked = np.minimum(ranked, 1.0)
+    else:
+        raise ValueError(f"Unknown p-value adjustment method: {method}")
+
+    result = np.empty(m)
+    result[order] = ranked
+    adjusted[valid] = result
+    return adjusted
+
+
+# Tidy table with one row per unordered pair of groups, with raw, Holm and
+# BH adjusted p-values. The correction runs over the G*(G-1)/2 unique pairs.
+def pairwise_logrank_table(groups, events, at_risk, n_workers=None, cache=None):
+    pairwise = logrank_pairwise if cache is None else cache.logrank_pairwise
+    statistic, p_values = pairwise(events, at_risk, n_workers=n_workers)
+    i, j = np.triu_indices(len(groups), k=1)
+    groups = np.asarray(groups)
+
+    table = pd.DataFrame({
+        'group_a': groups[i],
+        'group_b': groups[j],
+        'statistic': statistic[i, j],
+        'p_value': p_values[i, j],
+    })
+    table['p_holm'] = adjust_p_values(table['p_value'], 'holm')
+    table['p_bh'] = adjust_p_values(table['p_value'], 'bh')
+    return table
+
+
+# Symmetric G x G matrix of one p-value column of the pairwise table
+def pairwise_matrix(table, groups, column='p_bh'):
+    matrix = pd.DataFrame(np.nan, index=list(groups), columns=list(groups))
+    a = matrix.index.get_indexer(table['group_a'])
+    b = matrix.columns.get_indexer(table['group_b'])
+    values = matrix.to_numpy()
+    values[a, b] = table[column].to_numpy()
+    values[b, a] = table[column].to_numpy()
+    return pd.DataFrame(values, index=matrix.index, columns=matrix.columns)
+
+
+def plot_pairwise_heatmap(table, groups, column='p_bh', ax=None, alpha=0.05):
+    if ax is None:
+        _, ax = plt.subplots(figsize=(8, 7))
+    matrix = pairwise_matrix(table, groups, column)
+    with np.errstate(divide='ignore'):
+        values = -np.log10(matrix.to_numpy())
+
+    image = ax.imshow(values, cmap='viridis', vmin=0)
+    ax.figure.colorbar(image, ax=ax, label=f'-log10({column})')
+    # Outline the pairs that stay significant after correction
+    rows, cols = np.nonzero(matrix.to_numpy() < alpha)
+    ax.scatter(cols, rows, marker='s', s=12, facecolors='none', edgecolors='white', linewidths=0.5)
+
+    if len(groups) <= 50:
+        ax.set_xticks(range(len(groups)))
+        ax.set_xticklabels(groups, rotation=90)
+        ax.set_yticks(range(len(groups)))
+        ax.set_yticklabels(groups)
+    return ax
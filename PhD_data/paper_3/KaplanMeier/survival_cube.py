@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from survival_counts import fit_km_counts
+
+
+class SurvivalCube:
+    """Dead/total worm counts as int32 arrays indexed by (group, time, replicate).
+
+    Labels live in small lookup tables (`groups`, `times`, `replicates`), so
+    selecting a group is an index into the cube rather than a boolean mask
+    over a long table.
+    """
+
+    def __init__(self, groups, times, replicates, dead, total):
+        self.groups = np.asarray(groups, dtype=object)
+        self.times = np.asarray(times)
+        self.replicates = np.asarray(replicates, dtype=object)
+        self.dead = np.asarray(dead, dtype=np.int32)
+        self.total = np.asarray(total, dtype=np.int32)
+        self.group_index = {group: i for i, group in enumerate(self.groups)}
+        self._censored = None
+        self._dead_by_time = None
+        self._censored_by_time = None
+
+    # Build the cube from a long table. Groups and replicates keep their order
+    # of first appearance, times are sorted. Without a replicate column the
+    # rows of each (group, time) cell are numbered in order of appearance.
+    @classmethod
+    def from_frame(cls, df, group_col='group', time_col='time', dead_col='dead',
+                   total_col='total', replicate_col=None):
+        groups = pd.unique(df[group_col])
+        times = np.sort(pd.unique(df[time_col]))
+        if replicate_col is None:
+            replicate_codes = df.groupby([group_col, time_col], sort=False, observed=True).cumcount().to_numpy()
+            n_replicates = replicate_codes.max() + 1 if len(df) else 0
+            replicates = np.arange(1, n_replicates + 1)
+        else:
+            replicates = pd.unique(df[replicate_col])
+            replicate_codes = pd.Categorical(df[replicate_col], categories=replicates).codes
+
+        g = pd.Categorical(df[group_col], categories=groups).codes
+        t = np.searchsorted(times, df[time_col].to_numpy())
+
+        dead = np.zeros((len(groups), len(times), len(replicates)), dtype=np.int32)
+        total = np.zeros_like(dead)
+        np.add.at(dead, (g, t, replicate_codes), df[dead_col].to_numpy())
+        np.add.at(total, (g, t, replicate_codes), df[total_col].to_numpy())
+        return cls(groups, times, replicates, dead, total)
+
+    @property
+    def shape(self):
+        return self.dead.shape
+
+    @property
+    def censored(self):
+        if self._censored is None:
+            self._censored = self.total - self.dead
+        return self._censored
+
+    # Replicate sums, (group, time). Computed once and reused.
+    @property
+    def dead_by_time(self):
+        if self._dead_by_time is None:
+            self._dead_by_time = self.dead.sum(axis=2)
+        return self._dead_by_time
+
+    # Cells that scored more dead than total worms contribute no censored
+    # worms, as with the per-worm expansion the scripts used to do.
+    @property
+    def censored_by_time(self):
+        if self._censored_by_time is None:
+            self._censored_by_time = np.clip(self.censored, 0, None).sum(axis=2)
+        return self._censored_by_time
+
+    # (dead, total) views of one group, shaped (time, replicate)
+    def group(self, name):
+        i = self.group_index[name]
+        return self.dead[i], self.total[i]
+
+    # Event and at-risk matrices in the same form as
+    # survival_counts.count_matrices(); censored worms are only included in the
+    # risk set when include_censored is set.
+    def count_matrices(self, include_censored=False):
+        events = self.dead_by_time.astype(float)
+        leaving = events + self.censored_by_time if include_censored else events
+        at_risk = np.cumsum(leaving[:, ::-1], axis=1)[:, ::-1]
+        return events, at_risk
+
+    def fit_km(self, name, alpha=None, cache=None):
+        i = self.group_index[name]
+        return fit_km_counts(self.times, self.dead_by_time[i], self.censored_by_time[i],
+                             label=name, alpha=alpha, cache=cache)
+
+    def fit_km_all(self, alpha=None, cache=None):
+        return {group: self.fit_km(group, alpha=alpha, cache=cache) for group in self.groups}
+
+    # Back to a long table with one row per (group, time, replicate)
+    def to_frame(self):
+        g, t, r = np.indices(self.shape).reshape(3, -1)
+        return pd.DataFrame({
+            'group': self.groups[g],
+            'time': self.times[t],
+            'replicate': self.replicates[r],
+            'dead': self.dead.ravel(),
+            'total': self.total.ravel(),
+            'censored': self.censored.ravel(),
+        })
@@ -0,0 +1,91 @@
+import numpy as np
+
+
+# Worms are only scored at fixed timepoints, so a death recorded at t_k
+# happened somewhere in (t_{k-1}, t_k] (before the first scoring for t_0) and
+# a worm alive at t_k is right-censored at (t_k, inf). Returns the interval
+# bounds and a (group, interval) weight matrix, deaths first then censored.
+def scheduled_intervals(times, dead, censored):
+    times = np.asarray(times, dtype=float)
+    left = np.concatenate([np.append(-np.inf, times[:-1]), times])
+    right = np.concatenate([times, np.full(len(times), np.inf)])
+    weights = np.concatenate([np.asarray(dead, dtype=float),
+                              np.clip(np.asarray(censored, dtype=float), 0, None)], axis=-1)
+    return left, right, weights
+
+
+# Turnbull's innermost intervals (q, p] of a set of half-open (left, right]
+# observation intervals: a left endpoint immediately followed by a right
+# endpoint once all endpoints are sorted. On ties right endpoints come first,
+# since (a, t] and (t, b] do not overlap.
+def innermost_intervals(left, right):
+    values = np.concatenate([left, right])
+    is_right = np.concatenate([np.zeros(len(left), dtype=bool), np.ones(len(right), dtype=bool)])
+    order = np.lexsort((~is_right, values))
+    values, is_right = values[order], is_right[order]
+
+    starts = np.flatnonzero(~is_right[:-1] & is_right[1:])
+    return values[starts], values[starts + 1]
+
+
+# Self-consistency (EM) iterations for the interval-censored NPMLE, run for
+# all groups at once. `weights` is (group, observation interval); the result
+# is the probability mass on each innermost interval, (group, interval).
+def npmle_em(left, right, weights, tol=1e-9, max_iter=10_000):
+    q, p = innermost_intervals(left, right)
+    # alpha[i, j]: innermost interval j lies inside observation interval i
+    alpha = ((left[:, None] <= q[None, :]) & (p[None, :] <= right[:, None])).astype(float)
+
+    # The intervals are shared by all groups, but a group only puts mass on
+    # those ending at one of its own observed right endpoints. This keeps the
+    # support on the group's own innermost intervals when some timepoints
+    # have no worms in it.
+    weights = np.atleast_2d(weights)
+    totals = weights.sum(axis=1, keepdims=True)
+    support = ((weights > 0) @ (right[:, None] == p[None, :])) > 0
+    mass = support / np.maximum(support.sum(axis=1, keepdims=True), 1)
+    for iteration in range(max_iter):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.where(weights > 0, weights / (mass @ alpha.T), 0.0)
+        updated = mass * (share @ alpha) / np.maximum(totals, 1)
+        converged = np.abs(updated - mass).max() < tol
+        mass = updated
+        if converged:
+            break
+    return q, p, mass, iteration + 1
+
+
+# Interval-censored survival for scheduled scoring data. Survival is exact
+# at the scoring times; between them it is only known to fall somewhere in
+# the innermost interval, which plot_npmle() draws as a straight segment.
+def fit_npmle_counts(times, dead, censored, tol=1e-9, max_iter=10_000):
+    left, right, weights = scheduled_intervals(times, dead, censored)
+    q, p, mass, n_iter = npmle_em(left, right, weights, tol=tol, max_iter=max_iter)
+    times = np.asarray(times, dtype=float)
+
+    survival_after = 1.0 - np.cumsum(mass, axis=1)
+    at_times = (p[None, :] <= times[:, None]).sum(axis=1)
+    survival = np.hstack([np.ones((len(mass), 1)), survival_after])[:, at_times]
+    return {
+        'times': times,
+        'survival': survival,
+        'intervals': (q, p),
+        'mass': mass,
+        'n_iter': n_iter,
+    }
+
+
+def plot_npmle(ax, result, index, color=None, label='_nolegend_', linestyle='--', **kwargs):
+    q, p = result['intervals']
+    survival_after = 1.0 - np.cumsum(result['mass'][index])
+    survival_before = np.append(1.0, survival_after[:-1])
+
+    # Mass before the first scoring time is drawn as a drop at that time;
+    # nothing is known past the last one
+    start, end = result['times'][0], result['times'][-1]
+    shown = q < end
+    x = np.column_stack([np.maximum(q, start), p])[shown].ravel()
+    y = np.column_stack([survival_before, survival_after])[shown].ravel()
+    x = np.append(start, x)
+    y = np.append(1.0, y)
+    return ax.plot(x, y, color=color, label=label, linestyle=linestyle, **kwargs)